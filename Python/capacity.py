@@ -0,0 +1,157 @@
+import argparse
+import json
+import sys
+import numpy as np
+from jtl_analyzer import analyze, test_plan_schedule
+from json_html_conv import load_jmeter_config
+
+########### Global Declarations #########
+
+# A step is sustained while throughput keeps up with the offered load, latency stays near the
+# first step's and errors stay low; the first step that is not marks the knee
+DEFAULT_LIMITS = {
+    "min_scaling": 0.9,                 # Achieved / expected throughput
+    "max_latency_factor": 2.0,          # p95 over the first step's p95 ...
+    "min_latency_increase_ms": 50,      # ... and at least this many ms above it
+    "max_error_pct": 1.0,
+}
+
+
+########### Code  #########
+
+def profile_steps(schedule, ramps=False):
+    """
+    Steps of a load profile as (start offset s, end offset s, target tps). Ramp rows are
+    skipped unless ramps is set; steps are measured at their end level.
+    """
+    steps, offset = [], 0.0
+    for start, end, duration in schedule:
+        if duration > 0 and (ramps or start == end):
+            steps.append((offset, offset + duration, end))
+        offset += duration
+    return steps
+
+def step_windows(series, run_start, interval, steps):
+    """
+    Aggregate the timeline windows of each step: sample rate, median of the windows' p95 and
+    error percentage. The first window of a step is skipped while the load settles, and
+    windows crossing a step boundary are left out. Steps without windows are None.
+    """
+    times = np.array([window["time"] for window in series], dtype=np.float64)
+    counts = np.array([window["sampleCount"] for window in series], dtype=np.float64)
+    errors = np.array([window["errorPct"] * window["sampleCount"] / 100.0 for window in series], dtype=np.float64)
+    p95 = np.array([window["p95"] for window in series], dtype=np.float64)
+    offsets = (times - run_start) / 1000.0
+
+    result = []
+    for start, end, target in steps:
+        inside = (offsets >= start + interval) & (offsets + interval <= end)
+        # Windows without samples are missing from the timeline but still count as time
+        windows = np.floor((end - interval) / interval) - np.ceil((start + interval) / interval) + 1
+        if not inside.any() or windows <= 0:
+            result.append(None)
+            continue
+        total = counts[inside].sum()
+        result.append({
+            "target": target,
+            "throughput": float(total / (windows * interval)),
+            "p95": float(np.median(p95[inside])),
+            "errorPct": float(errors[inside].sum() * 100.0 / total) if total else 0.0,
+        })
+    return result
+
+def find_knee(steps, limits):
+    """
+    Walk the measured steps in order. Expected throughput scales the first step's with the
+    target (so transactions with a share of the load are judged by their own rate); the first
+    step that falls short, or whose latency or errors exceed the limits, is the knee.
+    Returns maxSustainableTps (throughput of the last sustained step), the knee step and why.
+    """
+    measured = [step for step in steps if step is not None]
+    result = {"maxSustainableTps": None, "sustainedTarget": None, "kneeTarget": None, "saturated": False, "reason": "", "steps": steps}
+    if not measured:
+        result["reason"] = "no complete steps"
+        return result
+
+    base = measured[0]
+    for step in measured:
+        reasons = []
+        expected = base["throughput"] * step["target"] / base["target"] if base["target"] else step["throughput"]
+        if expected and step["throughput"] < limits["min_scaling"] * expected:
+            reasons.append(f"throughput {step['throughput']:.2f}/s of {expected:.2f}/s expected")
+        if step["p95"] > max(base["p95"] * limits["max_latency_factor"], base["p95"] + limits["min_latency_increase_ms"]):
+            reasons.append(f"p95 {step['p95']:g} ms (first step {base['p95']:g} ms)")
+        if step["errorPct"] > limits["max_error_pct"]:
+            reasons.append(f"errors {step['errorPct']:.2f}%")
+        if reasons:
+            result.update(saturated=True, kneeTarget=step["target"], reason="; ".join(reasons))
+            return result
+        result.update(maxSustainableTps=step["throughput"], sustainedTarget=step["target"])
+    result["reason"] = "no knee within the tested load"
+    return result
+
+def capacity(timeline, schedule, limits=None, ramps=False):
+    """
+    Knee point and maximum sustainable TPS of "Total" and of every transaction, from a
+    timeline (jtl_analyzer.py --timeline structure) of a run with the given load profile.
+    """
+    limits = dict(DEFAULT_LIMITS, **{key: value for key, value in (limits or {}).items() if key in DEFAULT_LIMITS})
+    steps = profile_steps(schedule, ramps)
+    if not steps:
+        raise ValueError("the load profile has no steps")
+    interval = timeline["interval"]
+    run_start = min(series[0]["time"] for series in timeline["series"].values() if series)
+    return {
+        "interval": interval,
+        "steps": [{"start": start, "end": end, "target": target} for start, end, target in steps],
+        "transactions": {name: find_knee(step_windows(series, run_start, interval, steps), limits)
+                         for name, series in timeline["series"].items()},
+    }
+
+def load_timeline(results_path, interval):
+    """
+    A timeline file from jtl_analyzer.py --timeline, or the timeline of a JTL file.
+    """
+    if results_path.endswith(".json"):
+        with open(results_path, "r") as rf:
+            return json.load(rf)
+    stats = analyze(results_path, interval=interval)
+    return {"interval": interval, "series": stats.timeline.series(stats.labels)}
+
+def main(results_path, output, test_plan=None, steps=None, step_duration=None, interval=10, config=None, ramps=False):
+    try:
+        limits = load_jmeter_config(config).get("capacity") if config else None
+        if steps:
+            schedule = [(float(level), float(level), step_duration) for level in steps.split(",")]
+        else:
+            schedule = test_plan_schedule(test_plan)
+        if len(profile_steps(schedule, ramps)) < 2:
+            print("The load profile is not stepped; no capacity analysis.")
+            return
+        result = capacity(load_timeline(results_path, interval), schedule, limits, ramps)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error analyzing capacity: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    with open(output, "w") as wf:
+        json.dump(result, wf, indent=4)
+    total = result["transactions"].get("Total", {})
+    print(f"Max sustainable throughput {total.get('maxSustainableTps') or 0:.2f}/s ({total.get('reason')}), written to '{output}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the knee point (maximum sustainable TPS) of a stair-step load test, per transaction and overall.")
+    parser.add_argument("results", help="JTL result file, or timeline file from jtl_analyzer.py --timeline")
+    parser.add_argument("--output", default="capacity.json", help="Output file (default: capacity.json)")
+    parser.add_argument("--test-plan", help="JMX whose enabled Throughput Shaping Timer defines the steps")
+    parser.add_argument("--steps", help="Comma separated target TPS per step, instead of --test-plan")
+    parser.add_argument("--step-duration", type=float, help="Seconds per step, with --steps")
+    parser.add_argument("--interval", type=float, default=10, help="Window length in seconds when reading a JTL file (default: 10)")
+    parser.add_argument("--config", help="configfile.yml with tests.jmeter.capacity limits")
+    parser.add_argument("--ramps", action="store_true", help="Also judge ramp rows of the profile, at their end level")
+    args = parser.parse_args()
+
+    if not args.test_plan and not args.steps:
+        parser.error("either --test-plan or --steps is required")
+    if args.steps and not args.step_duration:
+        parser.error("--steps needs --step-duration")
+    main(args.results, args.output, args.test_plan, args.steps, args.step_duration, args.interval, args.config, args.ramps)
@@ -0,0 +1,79 @@
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+from host_metrics import CLOCK_TICKS, CpuTimes, RaplEnergy, ThermalZones
+
+########### Global Declarations #########
+
+# Fake /proc and /sys trees: "before" is read first, then "after" is written over it in place
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "host")
+
+# Expected readings of the fixtures
+EXPECTED_BUSY_PCT = [75.0, 50.0, 100.0]                 # Host (guest time not counted twice), cpu0, cpu1
+EXPECTED_BUSY_SECONDS = 300 / CLOCK_TICKS
+# intel-rapl:0 wraps at max_energy_range_uj: 171150 + 262143328850 - 262142828850 uJ;
+# intel-rapl:1 adds 2.5 J and the intel-rapl:0:0 sub-domain is not counted again
+EXPECTED_JOULES = 0.67115 + 2.5
+EXPECTED_TEMPERATURE = (61.5, 58.0)                     # Hottest zone before and after
+
+
+########### Code  #########
+
+def apply_snapshot(source, root):
+    """
+    Overwrite the files under root with those of a fixture snapshot, keeping their inodes so
+    descriptors opened on the "before" files read the new content.
+    """
+    for directory, _, files in os.walk(source):
+        for name in files:
+            with open(os.path.join(directory, name), "r") as rf, open(os.path.join(root, os.path.relpath(directory, source), name), "w") as wf:
+                wf.write(rf.read())
+
+def check(root):
+    """
+    Read the fixture through CpuTimes, RaplEnergy and ThermalZones; returns the failed checks.
+    """
+    failures = []
+    expect = lambda name, value, expected: failures.append(f"{name}: {value}, expected {expected}") if not math.isclose(value, expected, rel_tol=1e-9) else None
+
+    proc_root, sysfs_root = os.path.join(root, "proc"), os.path.join(root, "sys")
+    cpu_times, rapl, thermal = CpuTimes(proc_root), RaplEnergy(sysfs_root), ThermalZones(sysfs_root)
+    try:
+        if cpu_times.file is None or cpu_times.cores != 2:
+            failures.append(f"CpuTimes: {cpu_times.cores} CPUs from the fixture's proc/stat, expected 2")
+        if len(rapl.domains) != 2:
+            failures.append(f"RaplEnergy: {len(rapl.domains)} package domains, expected 2")
+        expect("temperature before", thermal.sample(), EXPECTED_TEMPERATURE[0])
+
+        apply_snapshot(os.path.join(FIXTURES, "after"), root)
+        for index, (busy, expected) in enumerate(zip(cpu_times.sample().tolist(), EXPECTED_BUSY_PCT)):
+            expect("host busy %" if index == 0 else f"cpu{index - 1} busy %", busy, expected)
+        expect("busy seconds", cpu_times.busy_seconds, EXPECTED_BUSY_SECONDS)
+        expect("joules", rapl.sample(), EXPECTED_JOULES)
+        expect("temperature after", thermal.sample(), EXPECTED_TEMPERATURE[1])
+
+        # A counter read mid-write (empty) is skipped and keeps the energy so far
+        with open(os.path.join(sysfs_root, "class", "powercap", "intel-rapl:1", "energy_uj"), "w"):
+            pass
+        expect("joules after a failed read", rapl.sample(), EXPECTED_JOULES)
+    finally:
+        cpu_times.close()
+        rapl.close()
+        thermal.close()
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the host metric readers against the fake /proc and /sys trees in fixtures/host.")
+    parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        shutil.copytree(os.path.join(FIXTURES, "before"), root, dirs_exist_ok=True)
+        failures = check(root)
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}", file=sys.stderr)
+        sys.exit(1)
+    print("Host metric readers match the fixtures.")
@@ -0,0 +1,190 @@
+import json
+import logging
+import re
+from collections import defaultdict
+
+########### Global Declarations #########
+
+# Aliases for the parsed response body, e.g. "var jsonData = pm.response.json();"
+JSON_ALIAS = re.compile(r'(?:var|let|const)\s+(\w+)\s*=\s*(?:pm\.response\.json\(\)|JSON\.parse\(\s*responseBody\s*\))')
+
+# pm.environment.set("token", <expression>) and the legacy postman.setEnvironmentVariable form
+VARIABLE_SET = re.compile(
+    r'(?:pm\.(?:environment|collectionVariables|globals|variables)\.set|postman\.set(?:Environment|Global)Variable)'
+    r'\(\s*["\']([^"\']+)["\']\s*,\s*(.+?)\s*\)\s*;?\s*$'
+)
+
+# Property accessors that translate directly into a JSONPath
+JSON_ACCESSORS = re.compile(r'^(?:\.\w+|\[\d+\]|\[["\'][^"\']+["\']\])*$')
+JSON_ACCESSOR = re.compile(r'\.(\w+)|\[(\d+)\]|\[["\']([^"\']+)["\']\]')
+
+RESPONSE_HEADER = re.compile(r'^(?:pm\.response\.headers\.get|postman\.getResponseHeader)\(\s*["\']([^"\']+)["\']\s*\)$')
+
+# {{variable}} references in request text
+POSTMAN_VARIABLE = re.compile(r'\{\{([^{}]+)\}\}')
+
+# Tokens that can carry a dynamic value (ids, UUIDs, JWTs, opaque tokens) inside request text
+VALUE_TOKEN = re.compile(r'[\w.~+-]{6,}')
+
+
+########### Code  #########
+
+def json_path(accessors):
+    """
+    Translate JavaScript property accessors (.a[0]["b c"]) into a JSONPath expression.
+    """
+    path = '$'
+    for name, index, quoted in JSON_ACCESSOR.findall(accessors):
+        if name:
+            path += f'.{name}'
+        elif index:
+            path += f'[{index}]'
+        else:
+            path += f"['{quoted}']"
+    return path
+
+def script_extractors(item):
+    """
+    Extractors for the variables a request's Postman test script sets from its response.
+    Returns a list of (variable, kind, expression) with kind 'json' or 'header'.
+    """
+    extractors = []
+    for event in item.get('event') or []:
+        if event.get('listen') != 'test':
+            continue
+        exec_lines = (event.get('script') or {}).get('exec') or []
+        if isinstance(exec_lines, str):
+            exec_lines = exec_lines.splitlines()
+        aliases = {'pm.response.json()'}
+        for line in exec_lines:
+            alias = JSON_ALIAS.search(line)
+            if alias:
+                aliases.add(alias.group(1))
+                continue
+            found = VARIABLE_SET.search(line.strip())
+            if not found:
+                continue
+            variable, expression = found.groups()
+            header = RESPONSE_HEADER.match(expression)
+            if header:
+                extractors.append((variable, 'header', header.group(1)))
+                continue
+            for alias in aliases:
+                accessors = expression[len(alias):]
+                if expression.startswith(alias) and JSON_ACCESSORS.match(accessors):
+                    extractors.append((variable, 'json', json_path(accessors)))
+                    break
+            else:
+                logging.info(f"Correlation: could not translate '{expression}' for variable '{variable}' in '{item.get('name', '')}'")
+    return extractors
+
+def example_values(item):
+    """
+    Yield (value, json_path, key) for the dynamic-looking leaves of a request's saved example
+    responses. Only strings/numbers of at least 6 characters containing a digit qualify,
+    which keeps words like "success" or "application/json" out.
+    """
+    for response in item.get('response') or []:
+        try:
+            body = json.loads(response.get('body') or '')
+        except (TypeError, ValueError):
+            continue
+        stack = [(body, '$', '')]
+        while stack:
+            node, path, key = stack.pop()
+            if isinstance(node, dict):
+                for child_key, child in node.items():
+                    child_path = f'{path}.{child_key}' if re.fullmatch(r'\w+', child_key) else f"{path}['{child_key}']"
+                    stack.append((child, child_path, child_key))
+            elif isinstance(node, list):
+                for index, child in enumerate(node):
+                    stack.append((child, f'{path}[{index}]', key))
+            elif isinstance(node, (str, int)) and not isinstance(node, bool):
+                value = str(node)
+                if len(value) >= 6 and any(char.isdigit() for char in value) and VALUE_TOKEN.fullmatch(value):
+                    yield value, path, key
+
+def plan_correlations(events, per_folder=False):
+    """
+    First pass over the collection events (with example responses included). Returns
+    (extractors, substitutions): extractors maps a request ordinal to the extractors to attach
+    to it, substitutions maps (group, literal value) to (producer ordinal, variable reference)
+    for values that a later request of the same group reuses.
+    With per_folder, every top-level folder becomes its own Thread Group (its group is the
+    folder's position among the top-level items, loose requests share group None). JMeter
+    variables are per thread, so values are only correlated within a group, and variables a
+    test script sets in one group but requests of another group use are warned about.
+    """
+    extractors = defaultdict(list)
+    substitutions = {}
+    candidates = {}
+    used_names = set()
+    ordinal = 0
+    depth = top = 0
+    group_names = {None: 'Thread Group'}
+    script_groups = defaultdict(set)    # Variable -> groups whose test scripts set it
+    uses = defaultdict(set)             # Variable -> groups whose requests use it
+    for event, item in events:
+        if event in ('folder_start', 'request') and depth == 0:
+            top += 1
+        if event == 'folder_start':
+            depth += 1
+            continue
+        if event == 'folder_end':
+            depth -= 1
+            if depth == 0:
+                group_names[top] = item.get('name', '')
+            continue
+        if event != 'request':
+            continue
+        ordinal += 1
+        group = top if per_folder and depth else None
+
+        # Values captured by earlier examples of the same group and reused verbatim in this request
+        request_text = json.dumps(item.get('request') or {})
+        for token in set(VALUE_TOKEN.findall(request_text)):
+            candidate = candidates.get((group, token))
+            if candidate and (group, token) not in substitutions:
+                producer, path, key = candidate
+                name = 'corr_' + (re.sub(r'\W', '_', key) or 'value')
+                unique, suffix = name, 2
+                while unique in used_names:
+                    unique, suffix = f'{name}_{suffix}', suffix + 1
+                used_names.add(unique)
+                extractors[producer].append((unique, 'json', path))
+                substitutions[(group, token)] = (producer, f'${{{unique}}}')
+        for variable in POSTMAN_VARIABLE.findall(request_text):
+            uses[variable.strip()].add(group)
+
+        for extractor in script_extractors(item):
+            used_names.add(extractor[0])
+            extractors[ordinal].append(extractor)
+            script_groups[extractor[0]].add(group)
+
+        for value, path, key in example_values(item):
+            candidates.setdefault((group, value), (ordinal, path, key))
+
+    for variable, groups in script_groups.items():
+        for group in sorted(uses.get(variable, set()) - groups, key=lambda group: group or 0):
+            logging.warning(f"Correlation: '{variable}' is extracted in thread group(s) "
+                            f"{', '.join(repr(group_names.get(producer, '')) for producer in sorted(groups, key=lambda group: group or 0))} "
+                            f"but used in '{group_names.get(group, '')}'; JMeter variables are per thread, so those requests "
+                            f"get no extracted value. Move the producing request into that folder or disable thread_group_per_folder.")
+
+    if substitutions:
+        logging.info(f"Correlation: {len(substitutions)} hardcoded value(s) replaced by extracted variables")
+    return dict(extractors), substitutions
+
+def substitute_values(text, ordinal, substitutions, group=None):
+    """
+    Replace literals produced by earlier requests of the same group with their extracted
+    variable references.
+    """
+    if not substitutions:
+        return text
+
+    def resolve(match):
+        token = match.group()
+        found = substitutions.get((group, token))
+        return found[1] if found and found[0] < ordinal else token
+    return VALUE_TOKEN.sub(resolve, text)
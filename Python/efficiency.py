@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from json_html_conv import load_jmeter_config
+from metrics_store import read_header, read_metrics
+from results_store import connect, load_efficiency, previous_efficiency_run_id, store_efficiency
+
+########### Global Declarations #########
+
+# Written by sustainability.py in its working directory
+METRICS_FILE = "sustainability_metrics.bin"
+TARGETS_FILE = "sustainability_targets.bin"
+
+# The whole host, as opposed to the tracked targets (labels from sustainability.py --process/--pid/--cgroup)
+HOST_SOURCE = "host"
+
+
+########### Code  #########
+
+def host_usage(path):
+    """
+    Sample times (epoch s) and cumulative usage of the host: RAPL package energy (J, None
+    without RAPL) and busy CPU seconds over all cores.
+    """
+    samples = read_metrics(path)
+    times = samples["time"].astype(np.float64)
+    # cpu is the utilization since the previous sample
+    busy = samples["cpu"].astype(np.float64) / 100.0 * samples["active_cores"] * np.diff(times, prepend=times[:1])
+    energy = samples["energy"].astype(np.float64)
+    return times, {"energy": energy if np.isfinite(energy).any() else None, "cpu_seconds": np.cumsum(busy)}
+
+def target_usage(path):
+    """
+    {label: (sample times, cumulative usage)} of every target in a sustainability_targets.bin file.
+    """
+    _, meta = read_header(path)
+    samples = read_metrics(path)
+    result = {}
+    for index, target in enumerate(meta["targets"]):
+        rows = samples[samples["target"] == index]
+        if len(rows):
+            energy = rows["energy"].astype(np.float64)
+            result[target["label"]] = (rows["time"].astype(np.float64),
+                                       {"energy": energy if np.isfinite(energy).any() else None,
+                                        "cpu_seconds": rows["cpu_seconds"].astype(np.float64)})
+    return result
+
+def window_usage(times, cumulative, starts, ends):
+    """
+    Usage within every [start, end) window (epoch s), interpolated between samples. Windows
+    outside the sampled time only get the part the samples cover.
+    """
+    if cumulative is None:
+        return None
+    finite = np.isfinite(cumulative)
+    times, cumulative = times[finite], cumulative[finite]
+    return np.interp(ends, times, cumulative) - np.interp(starts, times, cumulative)
+
+def usage_row(energy, cpu_seconds, requests, duration):
+    """
+    Per request cost and throughput per watt (requests per joule) of one transaction and source.
+    """
+    per_request = lambda value: value / requests if value is not None and requests else None
+    return {
+        "energy": energy,
+        "cpuSeconds": cpu_seconds,
+        "meanPower": energy / duration if energy is not None and duration else None,
+        "joulesPerRequest": per_request(energy),
+        "cpuSecondsPerRequest": per_request(cpu_seconds),
+        "throughputPerWatt": requests / energy if energy else None,
+    }
+
+def efficiency(timeline, sources):
+    """
+    Join monitor samples with a results timeline (jtl_analyzer.py --timeline structure).
+    sources: {name: (sample times, {"energy": cumulative J or None, "cpu_seconds": cumulative})}.
+    The usage of every timeline window is shared out over the transactions by their share of
+    the window's samples; usage in windows without samples is not attributed to any of them.
+    "Total" gets the usage of the whole run, from the first window's start to the last one's end.
+    """
+    interval = timeline["interval"]
+    total = timeline["series"].get("Total") or []
+    if not total:
+        raise ValueError("the timeline has no samples")
+    starts = np.array([window["time"] for window in total], dtype=np.float64) / 1000.0
+    counts = np.array([window["sampleCount"] for window in total], dtype=np.float64)
+    start, end = starts[0], starts[-1] + interval
+    duration = end - start
+
+    # Usage per window and per source, plus the whole run as the last element
+    windows = {}
+    for name, (times, usage) in sources.items():
+        windows[name] = {key: window_usage(times, series, np.append(starts, start), np.append(starts + interval, end))
+                         for key, series in usage.items()}
+
+    transactions = {}
+    for label, series in timeline["series"].items():
+        requests = sum(window["sampleCount"] for window in series)
+        if label == "Total":
+            pick = lambda values: float(values[-1]) if values is not None else None
+        else:
+            index = np.searchsorted(starts, [window["time"] / 1000.0 for window in series])
+            share = np.array([window["sampleCount"] for window in series], dtype=np.float64) / counts[index]
+            pick = lambda values: float((values[:-1][index] * share).sum()) if values is not None else None
+        transactions[label] = {
+            "sampleCount": requests,
+            "throughput": requests / duration,
+            "sources": {name: usage_row(pick(usage["energy"]), pick(usage["cpu_seconds"]), requests, duration)
+                        for name, usage in windows.items()},
+        }
+
+    # Host power and throughput per watt over time
+    host = windows.get(HOST_SOURCE, {})
+    power = host["energy"][:-1] / interval if host.get("energy") is not None else np.full(len(starts), np.nan)
+    series = [{
+        "time": window["time"],
+        "throughput": window["throughput"],
+        "power": float(watts) if np.isfinite(watts) else None,
+        "throughputPerWatt": window["throughput"] / watts if np.isfinite(watts) and watts > 0 else None,
+    } for window, watts in zip(total, power)]
+
+    # Share of the run the monitor samples cover
+    covered = [max(0.0, min(end, times[-1]) - max(start, times[0])) / duration for times, _ in sources.values()]
+    return {
+        "interval": interval,
+        "start": int(start * 1000),
+        "end": int(end * 1000),
+        "duration": duration,
+        "coverage": min(covered) if covered else 0.0,
+        "sources": list(sources),
+        "transactions": transactions,
+        "timeline": series,
+    }
+
+def compare_efficiency(baseline, current):
+    """
+    Per transaction and source change (%) of joules and CPU seconds per request and of
+    throughput per watt against a stored run (load_efficiency structure).
+    """
+    change = lambda now, before: (now - before) * 100.0 / before if now is not None and before else None
+    results = []
+    for name, row in current["transactions"].items():
+        for source, usage in row["sources"].items():
+            base = (baseline.get(name) or {}).get(source)
+            result = {"transaction": name, "source": source, "joulesPerRequest": usage["joulesPerRequest"],
+                      "cpuSecondsPerRequest": usage["cpuSecondsPerRequest"], "throughputPerWatt": usage["throughputPerWatt"]}
+            if base and base["sampleCount"]:
+                before = usage_row(base["energy"], base["cpuSeconds"], base["sampleCount"], base["duration"])
+                result.update({
+                    "baselineJoulesPerRequest": before["joulesPerRequest"],
+                    "joulesPerRequestChangePct": change(usage["joulesPerRequest"], before["joulesPerRequest"]),
+                    "baselineCpuSecondsPerRequest": before["cpuSecondsPerRequest"],
+                    "cpuSecondsPerRequestChangePct": change(usage["cpuSecondsPerRequest"], before["cpuSecondsPerRequest"]),
+                    "throughputPerWattChangePct": change(usage["throughputPerWatt"], before["throughputPerWatt"]),
+                })
+            results.append(result)
+    return results
+
+def main(timeline_path, output, metrics=METRICS_FILE, targets=TARGETS_FILE, store=None, run_id=None, baseline=None, config=None):
+    try:
+        regression = (load_jmeter_config(config).get("regression") or {}) if config else {}
+        store = store or regression.get("store")
+        with open(timeline_path, "r") as rf:
+            timeline = json.load(rf)
+        sources = {HOST_SOURCE: host_usage(metrics)}
+        if os.path.exists(targets):
+            sources.update(target_usage(targets))
+        if not len(sources[HOST_SOURCE][0]):
+            raise ValueError(f"'{metrics}' has no samples")
+        result = efficiency(timeline, sources)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error joining sustainability metrics with results: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if result["coverage"] < 1.0:
+        print(f"Warning: the monitor samples cover {result['coverage'] * 100:.0f}% of the run; usage outside them is missing", file=sys.stderr)
+
+    if store:
+        conn = connect(store)
+        baseline_id = baseline or regression.get("baseline", "previous")
+        if baseline_id == "previous":
+            baseline_id = previous_efficiency_run_id(conn, run_id)
+        result["baseline"] = baseline_id
+        result["comparison"] = compare_efficiency(load_efficiency(conn, baseline_id) if baseline_id else {}, result)
+        store_efficiency(conn, run_id, result)
+        conn.close()
+
+    with open(output, "w") as wf:
+        json.dump(result, wf, indent=4)
+    total = result["transactions"]["Total"]
+    host = total["sources"][HOST_SOURCE]
+    energy = f"{host['joulesPerRequest']:.3f} J/request, {host['throughputPerWatt']:.3f} req/s per W" if host["energy"] else "no RAPL energy"
+    print(f"{total['sampleCount']} requests: {energy}, {host['cpuSecondsPerRequest'] * 1000:.2f} CPU ms/request, written to '{output}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Join sustainability monitor samples with JMeter results: energy and CPU time per request and transaction, throughput per watt.")
+    parser.add_argument("timeline", help="Timeline file from jtl_analyzer.py --timeline")
+    parser.add_argument("--output", default="efficiency.json", help="Output file (default: efficiency.json)")
+    parser.add_argument("--metrics", default=METRICS_FILE, help=f"Host metrics file from sustainability.py (default: {METRICS_FILE})")
+    parser.add_argument("--targets", default=TARGETS_FILE, help=f"Per-target metrics file from sustainability.py, used when present (default: {TARGETS_FILE})")
+    parser.add_argument("--store", help="SQLite results store; the run is saved there and compared with a baseline run")
+    parser.add_argument("--run-id", default=time.strftime("%Y%m%d-%H%M%S"), help="Id of this run in the results store (e.g. the build number)")
+    parser.add_argument("--baseline", help="Run id to compare with, or 'previous' for the latest stored run with efficiency data")
+    parser.add_argument("--config", help="configfile.yml whose tests.jmeter.regression store and baseline are used")
+    args = parser.parse_args()
+
+    main(args.timeline, args.output, args.metrics, args.targets, args.store, args.run_id, args.baseline, args.config)
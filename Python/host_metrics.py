@@ -0,0 +1,163 @@
+import glob
+import os
+import numpy as np
+import psutil
+
+########### Global Declarations #########
+
+# /proc/stat columns counted as CPU time: user nice system idle iowait irq softirq steal
+# (guest time is already included in user/nice); idle and iowait count as idle
+PROC_STAT_COLUMNS = 8
+IDLE_COLUMNS = (3, 4)
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+########### Code  #########
+
+def read_attribute(fd):
+    """
+    Current content of an open sysfs/procfs attribute; pread re-reads it without reopening.
+    """
+    return os.pread(fd, 4096, 0).decode().strip()
+
+def open_attribute(path):
+    """
+    File descriptor of a readable attribute, or None (missing, or root-only like RAPL counters).
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        read_attribute(fd)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+class CpuTimes:
+    """
+    Utilization of the whole host and of every logical CPU from the deltas between reads of
+    /proc/stat (psutil.cpu_times elsewhere). Reading never blocks; when no clock tick passed
+    since the previous read the previous utilization is returned. busy_seconds accumulates
+    the host's busy CPU time since the first read.
+    """
+
+    def __init__(self, proc_root="/proc"):
+        path = os.path.join(proc_root, "stat")
+        self.file = os.open(path, os.O_RDONLY) if os.path.exists(path) else None
+        # Enough of /proc/stat for the cpu lines; grown when a read ends inside them
+        self.read_size = 4096
+        # /proc/stat counts clock ticks, psutil seconds
+        self.ticks = CLOCK_TICKS if self.file is not None else 1
+        self.previous = self.read_times()
+        self.cores = len(self.previous[0]) - 1
+        self.busy_pct = np.zeros(self.cores + 1)
+        self.busy_seconds = 0.0
+
+    def read_times(self):
+        """
+        (total, idle) CPU time arrays: the "cpu" line first, then one entry per CPU.
+        """
+        if self.file is not None:
+            data = os.pread(self.file, self.read_size, 0)
+            while len(data) == self.read_size and b"\nintr" not in data:
+                self.read_size *= 2
+                data = os.pread(self.file, self.read_size, 0)
+            rows = []
+            for line in data.split(b"\n"):
+                if not line.startswith(b"cpu"):
+                    break
+                rows.append(line.split()[1:PROC_STAT_COLUMNS + 1])
+            times = np.array(rows, dtype=np.float64)
+            return times.sum(axis=1), times[:, IDLE_COLUMNS].sum(axis=1)
+        rows = [psutil.cpu_times()] + psutil.cpu_times(percpu=True)
+        total = np.array([sum(row) - getattr(row, "guest", 0) - getattr(row, "guest_nice", 0) for row in rows])
+        idle = np.array([row.idle + getattr(row, "iowait", 0) for row in rows])
+        return total, idle
+
+    def sample(self):
+        """
+        Busy percentage: element 0 for the host, then one per CPU.
+        """
+        total, idle = self.read_times()
+        elapsed = total - self.previous[0]
+        busy = elapsed - (idle - self.previous[1])
+        ticked = elapsed > 0
+        self.busy_seconds += float(busy[0]) / self.ticks
+        self.busy_pct = np.where(ticked, busy * 100.0 / np.where(ticked, elapsed, 1), self.busy_pct)
+        self.previous = (total, idle)
+        return self.busy_pct
+
+    def close(self):
+        if self.file is not None:
+            os.close(self.file)
+
+class RaplEnergy:
+    """
+    Package energy from the RAPL counters in /sys/class/powercap (intel-rapl:N; sub-domains are
+    parts of their package and are not added again). Counters wrap at max_energy_range_uj.
+    energy_uj is often readable by root only; without readable counters energy and power are NaN.
+    """
+
+    def __init__(self, sysfs_root="/sys"):
+        self.domains = []
+        for path in sorted(glob.glob(os.path.join(sysfs_root, "class", "powercap", "intel-rapl:*"))):
+            if os.path.basename(path).count(":") != 1:
+                continue
+            fd = open_attribute(os.path.join(path, "energy_uj"))
+            if fd is None:
+                continue
+            range_fd = open_attribute(os.path.join(path, "max_energy_range_uj"))
+            wrap = float(read_attribute(range_fd)) if range_fd is not None else float(2 ** 32)
+            if range_fd is not None:
+                os.close(range_fd)
+            self.domains.append((fd, wrap))
+        self.previous = self.read_counters()
+        self.joules = 0.0
+
+    def read_counters(self):
+        return [float(read_attribute(fd)) for fd, _ in self.domains]
+
+    def sample(self):
+        """
+        Joules used since the first read (NaN without counters).
+        """
+        if not self.domains:
+            return float("nan")
+        try:
+            counters = self.read_counters()
+        except (OSError, ValueError):
+            # A failed read is left out; the next delta covers it
+            return self.joules
+        for (_, wrap), now, before in zip(self.domains, counters, self.previous):
+            delta = now - before
+            self.joules += (delta + wrap if delta < 0 else delta) / 1e6
+        self.previous = counters
+        return self.joules
+
+    def close(self):
+        for fd, _ in self.domains:
+            os.close(fd)
+
+class ThermalZones:
+    """
+    Highest temperature (°C) over /sys/class/thermal/thermal_zone*; NaN without readable zones.
+    """
+
+    def __init__(self, sysfs_root="/sys"):
+        paths = sorted(glob.glob(os.path.join(sysfs_root, "class", "thermal", "thermal_zone*", "temp")))
+        self.zones = [fd for fd in map(open_attribute, paths) if fd is not None]
+
+    def sample(self):
+        readings = []
+        for fd in self.zones:
+            try:
+                readings.append(float(read_attribute(fd)) / 1000.0)
+            except (OSError, ValueError):
+                pass
+        return max(readings) if readings else float("nan")
+
+    def close(self):
+        for fd in self.zones:
+            os.close(fd)
@@ -1,8 +1,37 @@
 import json
 import argparse
 import sys, os
+import re
+import time
+import yaml
+from html import escape
+from jtl_analyzer import merge_sketches
+from results_store import compare_runs, connect, load_run, previous_run_id, run_statistics, store_run
+from sla import evaluate
 
-def json_to_html_table(json_data):
+PLACEHOLDER = re.compile(r"\$\{(JMETER_TXN_TABLE|JMETER_TIMELINE|JMETER_COMPARISON|JMETER_ERRORS|JMETER_CAPACITY|JMETER_EFFICIENCY)\}")
+
+def table_cell(value, style=""):
+    # Only text is escaped; numbers go straight in, which keeps large tables fast
+    text = escape(value) if isinstance(value, str) else value
+    return f"<td{style}>{text}</td>"
+
+def number_cell(text, style=""):
+    return f"<td{style}>{text}</td>"
+
+def html_table(headers, rows):
+    # rows: (row style, [rendered cells]); built as a list of parts and joined once
+    parts = ['<table class="data-table"><thead><tr>']
+    parts.extend(f"<th>{escape(header)}</th>" for header in headers)
+    parts.append("</tr></thead><tbody>")
+    for style, cells in rows:
+        parts.append(f"<tr{style}>")
+        parts.extend(cells)
+        parts.append("</tr>")
+    parts.append("</tbody></table>")
+    return "".join(parts)
+
+def json_to_html_table(json_data, sla_results=None):
     # Define the columns to exclude and rename headers for clarity
     excluded_columns = {"throughput", "receivedKBytesPerSec", "sentKBytesPerSec"}
     headers_map = {
@@ -16,74 +45,312 @@ def json_to_html_table(json_data):
         "maxResTime": "Max Response Time (ms)",
         "pct1ResTime": "90th Percentile Response Time (ms)",
         "pct2ResTime": "95th Percentile Response Time (ms)",
-        "pct3ResTime": "99th Percentile Response Time (ms)"
+        "pct3ResTime": "99th Percentile Response Time (ms)",
+        "correctedMedianResTime": "Corrected Median Response Time (ms)",
+        "correctedPct1ResTime": "Corrected 90th Percentile Response Time (ms)",
+        "correctedPct2ResTime": "Corrected 95th Percentile Response Time (ms)",
+        "correctedPct3ResTime": "Corrected 99th Percentile Response Time (ms)",
+        "apdex": "Apdex"
     }
+    # Cells with an SLA are highlighted as passed or failed
+    sla_styles = {True: ' style="background-color: #e0ffe0;"', False: ' style="background-color: #ffe0e0;"'}
+    sla_results = sla_results or {}
 
-    # Start the HTML table
-    html = "<table>"
-    html += "<tr>"
-    
-    # Add table headers (with renamed headings)
+    # Table headers (with renamed headings)
     headers = [key for key in json_data[next(iter(json_data))].keys() if key not in excluded_columns]
-    for header in headers:
-        html += f"<th>{headers_map.get(header, header)}</th>"
-    html += "</tr>"
+    if any(result["apdex"] is not None for result in sla_results.values()):
+        headers.append("apdex")
 
-    # Add table rows
+    rows = []
     for key, row in json_data.items():
         if key != "Total":  # Exclude "Total" row
-            html += "<tr>"
+            result = sla_results.get(key, {"apdex": None, "checks": {}})
+            cells = []
             for header in headers:
-                html += f"<td>{row.get(header, '')}</td>"
-            html += "</tr>"
+                style = sla_styles.get(result["checks"].get(header), "")
+                if header == "apdex":
+                    cells.append(number_cell(f"{result['apdex']:.2f}" if result["apdex"] is not None else "", style))
+                else:
+                    cells.append(table_cell(row.get(header, ''), style))
+            rows.append(("", cells))
+    return html_table([headers_map.get(header, header) for header in headers], rows)
+
+def timeline_to_html(timeline, chaos_start=None, chaos_length=None):
+    # Windows overlapping the chaos attack are highlighted
+    interval_ms = timeline["interval"] * 1000
+    chaos_end = chaos_start + chaos_length * 1000 if chaos_start is not None else None
+    in_chaos = lambda start: chaos_start is not None and start < chaos_end and start + interval_ms > chaos_start
+    chaos_style = lambda start: ' style="background-color: #ffe0e0;"' if in_chaos(start) else ""
+    clock = lambda epoch_ms: time.strftime('%H:%M:%S', time.localtime(epoch_ms / 1000))
+
+    total = timeline["series"].get("Total", [])
+    peak = max([window["p95"] for window in total] + [1])
+
+    note = f"<p>Windows of {timeline['interval']:g}s"
+    if chaos_start is not None:
+        note += f"; highlighted rows overlap the chaos attack ({clock(chaos_start)}, {chaos_length:g}s)"
+    note += ".</p>"
+
+    total_rows = [(chaos_style(window["time"]), [
+        number_cell(clock(window["time"])),
+        number_cell(f"{window['throughput']:.2f}"),
+        number_cell(f"{window['errorPct']:.2f}"),
+        number_cell(f"{window['p50']:g}"),
+        number_cell(f"{window['p95']:g}"),
+        number_cell(f"{window['p99']:g}"),
+        f'<td><div style="background-color: #4CAF50; height: 10px; width: {window["p95"] * 100 / peak:.0f}%;"></div></td>',
+    ]) for window in total]
+
+    # One row per transaction and window, so thousands of labels stay filterable
+    label_rows = [(chaos_style(window["time"]), [
+        table_cell(label),
+        number_cell(clock(window["time"])),
+        number_cell(f"{window['throughput']:.2f}"),
+        number_cell(f"{window['errorPct']:.2f}"),
+        number_cell(f"{window['p50']:g}"),
+        number_cell(f"{window['p95']:g}"),
+        number_cell(f"{window['p99']:g}"),
+    ]) for label, series in timeline["series"].items() if label != "Total" for window in series]
+
+    return "".join((
+        note,
+        html_table(["Time", "Throughput (req/s)", "Error Percentage (%)", "Median Response Time (ms)",
+                    "95th Percentile Response Time (ms)", "99th Percentile Response Time (ms)", "95th Percentile Trend"], total_rows),
+        html_table(["Transaction Name", "Time", "Throughput (req/s)", "Error Percentage (%)", "Median Response Time (ms)",
+                    "95th Percentile Response Time (ms)", "99th Percentile Response Time (ms)"], label_rows),
+    ))
+
+def comparison_to_html(results, baseline_id):
+    note = f"<p>Compared with run {escape(str(baseline_id))}.</p>" if baseline_id else "<p>No baseline run stored yet.</p>"
+    rows = []
+    for result in results:
+        cells = [table_cell(result["transaction"]), number_cell(f"{result['p95']:g}")]
+        if "baselineP95" in result:
+            cells += [
+                number_cell(f"{result['baselineP95']:g}"),
+                number_cell(f"{result['p95ChangePct']:+.1f}"),
+                number_cell(f"{result['throughputChangePct']:+.1f}"),
+                number_cell(f"{result['errorPctChange']:+.2f}"),
+                table_cell("Yes" if result["significant"] else "No"),
+            ]
+        else:
+            cells += [table_cell("")] * 5
+        cells.append(table_cell("; ".join(result["breaches"]) or "Pass"))
+        rows.append((' style="background-color: #ffe0e0;"' if result["breaches"] else "", cells))
+    return note + html_table(["Transaction Name", "95th Percentile Response Time (ms)", "Baseline 95th Percentile (ms)",
+                              "95th Percentile Change (%)", "Throughput Change (%)", "Error Percentage Change (pts)",
+                              "Significant", "Result"], rows)
+
+def errors_to_html(errors):
+    clock = lambda epoch_ms: time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(epoch_ms / 1000))
+    note = f"<p>{errors['totalErrors']} failed samples in {errors['clusterCount']} clusters; the largest are listed.</p>"
+    rows = [("", [
+        table_cell(cluster["transaction"]),
+        table_cell(cluster["responseCode"]),
+        table_cell(cluster["message"]),
+        number_cell(cluster["count"]),
+        number_cell(f"{cluster['share']:.1f}"),
+        number_cell(clock(cluster["firstTime"])),
+        number_cell(clock(cluster["lastTime"])),
+        table_cell(cluster["example"]),
+    ]) for cluster in errors["clusters"]]
+    return note + html_table(["Transaction Name", "Response Code", "Failure Message", "Count", "Share of Errors (%)",
+                              "First Occurrence", "Last Occurrence", "Example"], rows)
+
+def capacity_to_html(capacity):
+    total = capacity["transactions"].get("Total")
+    note = "<p>Knee point of the stair-step load: the first step where throughput stops scaling with the target, latency rises or errors appear.</p>"
+    tps = lambda value: f"{value:.2f}" if value is not None else ""
+    rows = [(' style="background-color: #ffe0e0;"' if result["saturated"] else "", [
+        table_cell(name),
+        number_cell(tps(result["maxSustainableTps"])),
+        number_cell(f"{result['sustainedTarget']:g}" if result["sustainedTarget"] is not None else ""),
+        number_cell(f"{result['kneeTarget']:g}" if result["kneeTarget"] is not None else ""),
+        table_cell(result["reason"]),
+    ]) for name, result in capacity["transactions"].items()]
+    parts = [note, html_table(["Transaction Name", "Max Sustainable Throughput (req/s)", "Sustained Target (TPS)",
+                               "Knee at Target (TPS)", "Limited By"], rows)]
+    if total:
+        step_rows = [("", [
+            number_cell(f"{step['target']:g}"),
+            number_cell(tps(step["throughput"])),
+            number_cell(f"{step['p95']:g}"),
+            number_cell(f"{step['errorPct']:.2f}"),
+        ]) for step in total["steps"] if step is not None]
+        parts.append(html_table(["Target (TPS)", "Throughput (req/s)", "95th Percentile Response Time (ms)", "Error Percentage (%)"], step_rows))
+    return "".join(parts)
+
+def efficiency_to_html(efficiency):
+    comparison = {(result["transaction"], result["source"]): result for result in efficiency.get("comparison", [])}
+    note = (f"<p>Energy (RAPL package) and CPU time over the {efficiency['duration']:g}s run, per source; a window's usage is shared over "
+            f"its transactions by sample count. Monitor coverage {efficiency['coverage'] * 100:.0f}%")
+    if "baseline" in efficiency:
+        note += f"; changes against run {escape(str(efficiency['baseline']))}" if efficiency["baseline"] else "; no baseline run stored yet"
+    note += ".</p>"
+    value = lambda number, fmt: format(number, fmt) if number is not None else ""
+    rows = []
+    for name, row in efficiency["transactions"].items():
+        for source, usage in row["sources"].items():
+            result = comparison.get((name, source), {})
+            rows.append(("", [
+                table_cell(name),
+                table_cell(source),
+                number_cell(row["sampleCount"]),
+                number_cell(value(usage["energy"], ".1f")),
+                number_cell(value(usage["joulesPerRequest"], ".4f")),
+                number_cell(value(result.get("joulesPerRequestChangePct"), "+.1f")),
+                number_cell(value(usage["cpuSecondsPerRequest"] * 1000 if usage["cpuSecondsPerRequest"] is not None else None, ".3f")),
+                number_cell(value(result.get("cpuSecondsPerRequestChangePct"), "+.1f")),
+                number_cell(value(usage["throughputPerWatt"], ".3f")),
+                number_cell(value(result.get("throughputPerWattChangePct"), "+.1f")),
+            ]))
+    return note + html_table(["Transaction Name", "Source", "Requests", "Energy (J)", "Energy per Request (J)", "Energy per Request Change (%)",
+                              "CPU per Request (ms)", "CPU per Request Change (%)", "Throughput per Watt (req/s/W)",
+                              "Throughput per Watt Change (%)"], rows)
 
-    # End the HTML table
-    html += "</table>"
-    return html
+def load_jmeter_config(config_path):
+    with open(config_path, "r") as file:
+        config = yaml.safe_load(file) or {}
+    return (config.get("tests") or {}).get("jmeter") or {}
 
 def main():
     # Parse command-line arguments
-    parser = argparse.ArgumentParser(description="Convert JSON data to an HTML table and insert it into success.html.")
-    parser.add_argument("json_file_path", help="Path to the JSON data file")
+    parser = argparse.ArgumentParser(description="Render JMeter results into a copy of the success.html template.")
+    parser.add_argument("json_file_path", nargs="?", help="Path to the folder containing statistics.json")
+    parser.add_argument("--template", default="./Templates/success.html", help="Report template (default: ./Templates/success.html, left unchanged)")
+    parser.add_argument("--output", default="./success_report.html", help="Rendered report (default: ./success_report.html)")
+    parser.add_argument("--timeline", help="Timeline file from jtl_analyzer.py --timeline to render into the report")
+    parser.add_argument("--errors", help="Failure clusters from jtl_analyzer.py --errors to render into the report")
+    parser.add_argument("--chaos-start", type=int, help="Chaos attack start (epoch milliseconds) to highlight in the timeline")
+    parser.add_argument("--chaos-length", type=float, default=0, help="Chaos attack duration in seconds")
+    parser.add_argument("--store", help="SQLite results store; the run is saved there and compared with a baseline run")
+    parser.add_argument("--run-id", default=time.strftime("%Y%m%d-%H%M%S"), help="Id of this run in the results store (e.g. the build number)")
+    parser.add_argument("--baseline", help="Run id to compare with, or 'previous' for the latest stored run")
+    parser.add_argument("--config", help="configfile.yml with tests.jmeter.regression thresholds")
+    parser.add_argument("--capacity", help="Knee point analysis from capacity.py to render into the report")
+    parser.add_argument("--efficiency", help="Energy and CPU per request from efficiency.py to render into the report")
+    parser.add_argument("--sketch", nargs="+", help="Sketch files from jtl_analyzer.py (one per load generator) to merge instead of reading statistics.json")
     args = parser.parse_args()
 
-    # Append 'statistics.json' to the folder path
-    json_file_path = os.path.join(args.json_file_path, "statistics.json")
-    print("File Path",json_file_path)
-    success_html_path = './Templates/success.html'
+    if not args.json_file_path and not args.sketch:
+        parser.error("either json_file_path or --sketch is required")
+    jmeter_config = load_jmeter_config(args.config) if args.config else {}
+    regression = jmeter_config.get("regression") or {}
+    sla = jmeter_config.get("sla") or {}
+    store_path = args.store or regression.get("store")
+    breaches = []
 
-    # Check if the file exists
-    if not os.path.isfile(json_file_path):
-        print(f"Error: '{json_file_path}' does not exist. Terminating process.", file=sys.stderr)
-        sys.exit(1)  # Terminate the process with a non-zero exit code
+    if args.sketch:
+        missing = [path for path in args.sketch if not os.path.isfile(path)]
+        if missing:
+            print(f"Error: '{', '.join(missing)}' does not exist. Terminating process.", file=sys.stderr)
+            sys.exit(1)
+    else:
+        # Append 'statistics.json' to the folder path
+        json_file_path = os.path.join(args.json_file_path, "statistics.json")
+        print("File Path",json_file_path)
+
+        # Check if the file exists
+        if not os.path.isfile(json_file_path):
+            print(f"Error: '{json_file_path}' does not exist. Terminating process.", file=sys.stderr)
+            sys.exit(1)  # Terminate the process with a non-zero exit code
     
+    # Loading, evaluating, comparing and storing the run is the gate itself: any error fails the build
     try:
-        # Read JSON data from the specified file
-        with open(json_file_path, "r") as file:
-            json_data = json.load(file)
+        if args.sketch:
+            # Percentiles from the merged histograms, not averages of per-node percentiles
+            stats = merge_sketches(args.sketch)
+            json_data = stats.statistics()
+        else:
+            stats = None
+            # Read JSON data from the specified file
+            with open(json_file_path, "r") as file:
+                json_data = json.load(file)
+
+        # Per transaction SLAs and Apdex, from the response time histograms when available
+        sla_results = evaluate(sla, json_data, stats) if sla else {}
+        breaches += [f"{name}: {'; '.join(result['breaches'])}" for name, result in sla_results.items() if result["breaches"]]
+
+        results = None
+        if store_path:
+            conn = connect(store_path)
+            baseline_id = args.baseline or regression.get("baseline", "previous")
+            if baseline_id == "previous":
+                baseline_id = previous_run_id(conn, args.run_id)
+            baseline = load_run(conn, baseline_id) if baseline_id else {}
+            results = compare_runs(baseline, run_statistics(json_data, stats), regression.get("thresholds"))
+            store_run(conn, args.run_id, json_data, stats)
+            conn.close()
+            breaches += [f"{result['transaction']}: {'; '.join(result['breaches'])}" for result in results if result["breaches"]]
+    except FileNotFoundError as e:
+        print(f"Error: {e}. Make sure the file path is correct.", file=sys.stderr)
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON file: {e}. Ensure it contains valid JSON.", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error evaluating the run: {e}", file=sys.stderr)
+        sys.exit(1)
 
+    # A report that cannot be rendered is not fatal; Jenkins then mails the plain template
+    try:
         # Convert JSON data to HTML table
-        html_table = json_to_html_table(json_data)
+        html_table = json_to_html_table(json_data, sla_results)
+        comparison_html = comparison_to_html(results, baseline_id) if results is not None else ""
+
+        timeline_html = ""
+        if args.timeline:
+            with open(args.timeline, "r") as file:
+                timeline_html = timeline_to_html(json.load(file), args.chaos_start, args.chaos_length)
+
+        errors_html = ""
+        if args.errors:
+            with open(args.errors, "r") as file:
+                errors_html = errors_to_html(json.load(file))
 
-        # Read success.html, replace placeholder, and write output to the same file
-        with open(success_html_path, "r") as file:
+        capacity_html = ""
+        if args.capacity:
+            with open(args.capacity, "r") as file:
+                capacity_html = capacity_to_html(json.load(file))
+
+        efficiency_html = ""
+        if args.efficiency:
+            with open(args.efficiency, "r") as file:
+                efficiency_html = efficiency_to_html(json.load(file))
+
+        # Read the template and fill the placeholders in one pass; Jenkins fills the others later
+        with open(args.template, "r") as file:
             success_html = file.read()
 
-        # Replace placeholder with generated HTML table
-        updated_html = success_html.replace("${JMETER_TXN_TABLE}", html_table)
+        sections = {
+            "JMETER_TXN_TABLE": html_table,
+            "JMETER_TIMELINE": timeline_html,
+            "JMETER_COMPARISON": comparison_html,
+            "JMETER_ERRORS": errors_html,
+            "JMETER_CAPACITY": capacity_html,
+            "JMETER_EFFICIENCY": efficiency_html,
+        }
+        updated_html = PLACEHOLDER.sub(lambda match: sections[match.group(1)], success_html)
 
-        # Save the modified HTML content back to success.html
-        with open(success_html_path, "w") as file:
+        # The template stays untouched for the next run
+        with open(args.output, "w") as file:
             file.write(updated_html)
 
-        print("HTML table inserted into 'success.html'")
+        print(f"Report written to '{args.output}'")
     
     except FileNotFoundError as e:
         print(f"Error: {e}. Make sure the file path is correct.", file=sys.stderr)
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON file: {e}. Ensure it contains valid JSON.", file=sys.stderr)
     except Exception as e:
-        print(f"An unexpected error occurred: {e}", file=sys.stderr)
+        print(f"An unexpected error occurred while rendering the report: {e}", file=sys.stderr)
+
+    # Fail the build when the run breaches the configured SLA/regression thresholds
+    if breaches:
+        print("Performance thresholds breached:", file=sys.stderr)
+        for breach in breaches:
+            print(f"  {breach}", file=sys.stderr)
+        sys.exit(2)
 
 if __name__ == "__main__":
     main()
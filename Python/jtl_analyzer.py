@@ -0,0 +1,739 @@
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+from itertools import islice
+from operator import itemgetter
+import numpy as np
+
+########### Global Declarations #########
+
+CHUNK_ROWS = 100000
+
+# Column order JMeter writes when the result file has no header line
+DEFAULT_FIELDS = ['timeStamp', 'elapsed', 'label', 'responseCode', 'responseMessage', 'threadName', 'dataType',
+                  'success', 'failureMessage', 'bytes', 'sentBytes', 'grpThreads', 'allThreads', 'URL', 'Latency',
+                  'IdleTime', 'Connect']
+
+# Percentiles reported as pct1ResTime/pct2ResTime/pct3ResTime (JMeter's aggregate_rpt_pct defaults)
+PERCENTILES = (90, 95, 99)
+
+# Log-linear (HDR style) histogram: values below SUB_BUCKETS are exact, above that every power of two
+# is split into SUB_BUCKETS/2 buckets, i.e. a relative error below 1/SUB_BUCKETS (0.8%).
+SUB_BUCKETS = 128
+HALF_BUCKETS = SUB_BUCKETS // 2
+SUB_BITS = SUB_BUCKETS.bit_length() - 1
+MAX_SHIFT = 40
+BUCKETS = HALF_BUCKETS * (MAX_SHIFT + 2)
+
+# The timeline keeps a (sparse) histogram per (window, label), so it merges 2**TIMELINE_COARSENING fine
+# buckets into one (8 per power of two, i.e. about 6% relative error) to stay small
+TIMELINE_COARSENING = 3
+TIMELINE_BUCKETS = BUCKETS >> TIMELINE_COARSENING
+LABEL_BITS = 20
+
+# Failure messages are grouped after masking the parts that vary between otherwise equal errors
+MESSAGE_MASKS = [
+    (re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '<uuid>'),
+    (re.compile(r'\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b'), '<id>'),
+    (re.compile(r'\d+(?:\.\d+)*'), '<n>'),
+]
+MESSAGE_LENGTH = 300
+MAX_CLUSTERS = 10000
+OTHER_MESSAGES = '<other messages>'
+
+# Coordinated omission correction: synthetic samples added per measured sample are capped,
+# and generated in batches of this many values
+MAX_SYNTHETIC = 10000
+SYNTHETIC_BATCH = 1 << 20
+
+# Enabled Throughput Shaping Timers and their (start, end, duration) rows in a JMX
+TIMER_PATTERN = re.compile(r'<kg\.apc\.jmeter\.timers\.VariableThroughputTimer [^>]*enabled="true"[^>]*>(.*?)</kg\.apc\.jmeter\.timers\.VariableThroughputTimer>', re.S)
+PROFILE_ROW_PATTERN = re.compile(r'<collectionProp name="[^"]*">\s*' + r'\s*'.join([r'<stringProp name="[^"]*">([^<]*)</stringProp>'] * 3) + r'\s*</collectionProp>')
+
+# Enabled Thread Groups and their thread counts in a JMX
+THREAD_GROUP_PATTERN = re.compile(r'<ThreadGroup [^>]*enabled="true"[^>]*>(.*?)</ThreadGroup>', re.S)
+NUM_THREADS_PATTERN = re.compile(r'<stringProp name="ThreadGroup\.num_threads">([^<]*)</stringProp>')
+# User Defined Variables of a JMX
+VARIABLE_PATTERN = re.compile(r'<stringProp name="Argument.name">(\w+)</stringProp>\s*<stringProp name="Argument.value">([^<]*)</stringProp>')
+
+CORRECTED_FIELDS = ("correctedMedianResTime", "correctedPct1ResTime", "correctedPct2ResTime", "correctedPct3ResTime")
+
+# Bumped when the sketch layout changes; sketches from different layouts are not merged
+SKETCH_VERSION = 1
+
+csv.field_size_limit(1 << 30)
+
+
+########### Code  #########
+
+def bucket_index(values):
+    """
+    Histogram bucket of each (non-negative integer) value.
+    """
+    values = np.maximum(np.asarray(values, dtype=np.int64), 0)
+    shift = np.clip(np.frexp(values.astype(np.float64))[1] - SUB_BITS, 0, MAX_SHIFT)
+    return HALF_BUCKETS * shift + (values >> shift)
+
+def bucket_bounds():
+    """
+    Lowest and highest value that falls into each bucket.
+    """
+    index = np.arange(BUCKETS)
+    shift = np.maximum(index // HALF_BUCKETS - 1, 0)
+    low = (index - HALF_BUCKETS * shift) << shift
+    return low, low + (1 << shift) - 1
+
+BUCKET_LOW, BUCKET_HIGH = bucket_bounds()
+TIMELINE_HIGH = BUCKET_HIGH[(np.arange(TIMELINE_BUCKETS) << TIMELINE_COARSENING) + (1 << TIMELINE_COARSENING) - 1]
+
+def histogram_percentiles(histogram, percentiles, minimum=None, maximum=None, high=BUCKET_HIGH):
+    """
+    Value at each percentile: the highest value (per `high`) of the bucket holding the sample
+    at that rank, clamped to the observed minimum and maximum.
+    """
+    total = histogram.sum()
+    if not total:
+        return [0.0 for _ in percentiles]
+    cumulative = np.cumsum(histogram)
+    ranks = np.maximum(np.ceil(np.asarray(percentiles, dtype=np.float64) / 100.0 * total), 1)
+    values = high[np.searchsorted(cumulative, ranks)].astype(np.float64)
+    if minimum is not None:
+        values = np.clip(values, minimum, maximum)
+    return values.tolist()
+
+def percentile_matrix(histograms, percentiles, high=BUCKET_HIGH, block=4096):
+    """
+    histogram_percentiles for every row of a 2D array of histograms at once (rows without
+    samples give 0). Rows are processed in blocks to bound the temporary cumulative sums.
+    """
+    result = np.zeros((len(histograms), len(percentiles)), dtype=np.float64)
+    for start in range(0, len(histograms), block):
+        cumulative = np.cumsum(histograms[start:start + block], axis=1)
+        total = cumulative[:, -1:]
+        for column, percentile in enumerate(percentiles):
+            ranks = np.maximum(np.ceil(percentile / 100.0 * total), 1)
+            index = np.minimum((cumulative < ranks).sum(axis=1), len(high) - 1)
+            result[start:start + block, column] = np.where(total[:, 0] > 0, high[index], 0)
+    return result
+
+def histogram_fraction_below(histogram, value):
+    """
+    Fraction of the histogram's samples at or below value. The bucket containing value is
+    split linearly, so the error is bounded by that bucket's width.
+    """
+    total = histogram.sum()
+    if not total:
+        return 0.0
+    index = int(bucket_index([int(value)])[0])
+    width = BUCKET_HIGH[index] - BUCKET_LOW[index] + 1
+    partial = histogram[index] * (int(value) - BUCKET_LOW[index] + 1) / width
+    return float((histogram[:index].sum() + partial) / total)
+
+def sparse_percentiles(cells, counts, totals, percentiles, high):
+    """
+    Percentiles of many histograms stored sparsely: cells are sorted row * buckets + bucket keys
+    with their counts, totals the sample count of every row (all rows non-empty). Returns a
+    (rows, percentiles) array of the highest value (per `high`) of the bucket at each rank.
+    """
+    buckets = len(high)
+    cumulative = np.cumsum(counts)
+    # Samples in all rows before each row
+    before = np.concatenate(([0], np.cumsum(totals)[:-1]))
+    result = np.zeros((len(totals), len(percentiles)), dtype=np.float64)
+    for column, percentile in enumerate(percentiles):
+        ranks = np.maximum(np.ceil(percentile / 100.0 * totals), 1)
+        index = np.searchsorted(cumulative, before + ranks)
+        result[:, column] = high[cells[index] % buckets]
+    return result
+
+def merge_cells(cells, counts):
+    """
+    Sum the counts of equal cell keys; returns the sorted unique keys and their counts.
+    """
+    unique, inverse = np.unique(cells, return_inverse=True)
+    return unique, np.bincount(inverse.reshape(-1), weights=counts, minlength=len(unique)).astype(np.int64)
+
+class Timeline:
+    """
+    Per (time window, label) counts, errors, response time sums and coarse histograms.
+    Histograms are kept sparse, as (row * TIMELINE_BUCKETS + bucket, count) cells of the
+    buckets actually hit, so memory follows the distinct (window, label, bucket) combinations
+    seen rather than windows x labels x buckets.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.rows = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.errors = np.zeros(0, dtype=np.int64)
+        self.elapsed_sum = np.zeros(0, dtype=np.float64)
+        self.cells = np.zeros(0, dtype=np.int64)
+        self.cell_counts = np.zeros(0, dtype=np.int64)
+        # Cells of recent chunks, merged into cells once they outgrow them
+        self.pending = []
+        self.pending_size = 0
+
+    def _grow(self, size):
+        if size <= len(self.count):
+            return
+        # Double the capacity so windows can be appended without copying on every chunk
+        extra = max(size, 2 * len(self.count)) - len(self.count)
+        self.count = np.concatenate((self.count, np.zeros(extra, dtype=np.int64)))
+        self.errors = np.concatenate((self.errors, np.zeros(extra, dtype=np.int64)))
+        self.elapsed_sum = np.concatenate((self.elapsed_sum, np.zeros(extra, dtype=np.float64)))
+
+    def _merge_pending(self):
+        if self.pending:
+            cells, counts = zip(*self.pending)
+            self.cells, self.cell_counts = merge_cells(np.concatenate((self.cells,) + cells), np.concatenate((self.cell_counts,) + counts))
+            self.pending, self.pending_size = [], 0
+
+    def add(self, chunk, ids):
+        """
+        Fold one chunk into its windows; ids are the chunk's label ids from JtlStats.
+        """
+        keys = ((chunk['timeStamp'] // int(self.interval * 1000)) << LABEL_BITS) | ids
+        unique, inverse = np.unique(keys, return_inverse=True)
+        rows = np.array([self.rows.setdefault(key, len(self.rows)) for key in unique.tolist()], dtype=np.int64)
+        self._grow(len(self.rows))
+        rows = rows[inverse.reshape(-1)]
+        size = len(self.count)
+        self.count += np.bincount(rows, minlength=size)
+        self.errors += np.bincount(rows, weights=~chunk['success'], minlength=size).astype(np.int64)
+        self.elapsed_sum += np.bincount(rows, weights=chunk['elapsed'], minlength=size)
+        cells, counts = np.unique(rows * TIMELINE_BUCKETS + (bucket_index(chunk['elapsed']) >> TIMELINE_COARSENING), return_counts=True)
+        self.pending.append((cells, counts))
+        self.pending_size += len(cells)
+        if self.pending_size > max(len(self.cells), CHUNK_ROWS):
+            self._merge_pending()
+
+    def series(self, labels):
+        """
+        Timeline per label plus "Total": lists of window entries ordered by time, with
+        throughput (samples/sec), error percentage, mean and p50/p90/p95/p99 in ms.
+        """
+        self._merge_pending()
+        names = {index: label for label, index in labels.items()}
+        keys = np.array(list(self.rows), dtype=np.int64)
+        rows = np.array(list(self.rows.values()), dtype=np.int64)
+        windows, window_index = np.unique(keys >> LABEL_BITS, return_inverse=True)
+        window_index = window_index.reshape(-1)
+        count = self.count[:len(rows)]
+
+        total = {name: np.zeros(len(windows), dtype=array.dtype) for name, array in (('count', self.count), ('errors', self.errors), ('elapsed_sum', self.elapsed_sum))}
+        for name in total:
+            np.add.at(total[name], window_index, getattr(self, name)[rows])
+
+        # Percentiles of every row, and of every window over all labels
+        percentiles = (50, 90, 95, 99)
+        row_percentiles = sparse_percentiles(self.cells, self.cell_counts, count, percentiles, TIMELINE_HIGH)
+        window_of_row = np.zeros(len(rows), dtype=np.int64)
+        window_of_row[rows] = window_index
+        bucket = self.cells % TIMELINE_BUCKETS
+        window_cells, window_counts = merge_cells(window_of_row[self.cells // TIMELINE_BUCKETS] * TIMELINE_BUCKETS + bucket, self.cell_counts)
+        total_percentiles = sparse_percentiles(window_cells, window_counts, total['count'], percentiles, TIMELINE_HIGH)
+
+        fields = ('time', 'throughput', 'sampleCount', 'errorPct', 'meanResTime', 'p50', 'p90', 'p95', 'p99')
+        entries = lambda window, count, errors, elapsed_sum, values: [dict(zip(fields, row)) for row in zip(
+            (window * int(self.interval * 1000)).tolist(), (count / self.interval).tolist(), count.tolist(),
+            (errors * 100.0 / count).tolist(), (elapsed_sum / count).tolist(), *values.T.tolist())]
+
+        result = {'Total': entries(windows, total['count'], total['errors'], total['elapsed_sum'], total_percentiles)}
+        order = np.lexsort((keys >> LABEL_BITS, keys & ((1 << LABEL_BITS) - 1)))
+        keys, rows = keys[order], rows[order]
+        label_entries = entries(keys >> LABEL_BITS, self.count[rows], self.errors[rows], self.elapsed_sum[rows], row_percentiles[rows])
+        for label_id, window in zip((keys & ((1 << LABEL_BITS) - 1)).tolist(), label_entries):
+            result.setdefault(names[label_id], []).append(window)
+        return result
+
+def normalize_message(message):
+    """
+    Failure message with UUIDs, hex ids and numbers masked, so e.g. "Timeout after 3012 ms
+    for order 8812" and "Timeout after 2950 ms for order 9120" fall into the same cluster.
+    """
+    message = ' '.join(message.split())[:MESSAGE_LENGTH]
+    for pattern, mask in MESSAGE_MASKS:
+        message = pattern.sub(mask, message)
+    return message
+
+class ErrorClusters:
+    """
+    Failed samples grouped by (label, response code, normalized message) with counts, first
+    and last occurrence and one raw example. Identical raw keys are grouped with NumPy first,
+    so messages are normalized once per distinct value rather than once per failure.
+    """
+
+    def __init__(self, max_clusters=MAX_CLUSTERS):
+        self.max_clusters = max_clusters
+        self.clusters = {}
+        self.normalized = {}
+        self.total = 0
+
+    def add(self, failures):
+        if not len(failures['timeStamp']):
+            return
+        raw = np.char.add(np.char.add(np.char.add(np.char.add(failures['label'], '\x1f'), failures['responseCode']), '\x1f'), failures['message'])
+        unique, inverse, counts = np.unique(raw, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        first = np.full(len(unique), np.iinfo(np.int64).max, dtype=np.int64)
+        last = np.full(len(unique), np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(first, inverse, failures['timeStamp'])
+        np.maximum.at(last, inverse, failures['timeStamp'])
+        self.total += len(failures['timeStamp'])
+
+        for key, count, start, end in zip(unique.tolist(), counts.tolist(), first.tolist(), last.tolist()):
+            label, code, message = key.split('\x1f', 2)
+            if message not in self.normalized:
+                if len(self.normalized) >= self.max_clusters:
+                    self.normalized.clear()
+                self.normalized[message] = normalize_message(message)
+            cluster_key = (label, code, self.normalized[message])
+            if cluster_key not in self.clusters and len(self.clusters) >= self.max_clusters:
+                cluster_key = (label, code, OTHER_MESSAGES)
+            cluster = self.clusters.get(cluster_key)
+            if cluster is None:
+                self.clusters[cluster_key] = {'count': count, 'firstTime': start, 'lastTime': end, 'example': message[:MESSAGE_LENGTH]}
+            else:
+                cluster['count'] += count
+                cluster['firstTime'] = min(cluster['firstTime'], start)
+                cluster['lastTime'] = max(cluster['lastTime'], end)
+
+    def top(self, limit):
+        """
+        The `limit` largest clusters, with their share of all failures.
+        """
+        ranked = sorted(self.clusters.items(), key=lambda item: item[1]['count'], reverse=True)[:limit]
+        return {
+            'totalErrors': self.total,
+            'clusterCount': len(self.clusters),
+            'clusters': [dict({'transaction': label, 'responseCode': code, 'message': message,
+                               'share': cluster['count'] * 100.0 / self.total}, **cluster)
+                         for (label, code, message), cluster in ranked],
+        }
+
+def test_plan_schedule(jmx_path):
+    """
+    Load profile of a JMeter plan as (start tps, end tps, seconds) rows: the rows of the first
+    enabled Throughput Shaping Timer, with ${VAR} references resolved from the User Defined
+    Variables. A plan without such a timer gives a single START_TPS -> END_TPS row over
+    TEST_DURATION.
+    """
+    with open(jmx_path, 'r') as rf:
+        plan = rf.read()
+    variables = dict(VARIABLE_PATTERN.findall(plan))
+    resolve = lambda value: float(re.sub(r'\$\{(\w+)\}', lambda match: variables.get(match.group(1), match.group(0)), value.strip()))
+
+    for timer in TIMER_PATTERN.findall(plan):
+        rows = PROFILE_ROW_PATTERN.findall(timer)
+        if rows:
+            return [tuple(map(resolve, row)) for row in rows]
+    if 'START_TPS' not in variables:
+        raise ValueError(f"'{jmx_path}' has no enabled Throughput Shaping Timer or START_TPS variable")
+    return [(resolve(variables['START_TPS']), resolve(variables.get('END_TPS', variables['START_TPS'])), resolve(variables.get('TEST_DURATION', '0')))]
+
+def test_plan_threads(jmx_path):
+    """
+    Threads of a JMeter plan: the sum of its enabled Thread Groups' num_threads, with ${VAR}
+    references resolved from the User Defined Variables. Groups sized by an expression (the
+    weighted groups of postman2jmx, which share out ${THREADS}) count as THREADS once.
+    None when the plan's threads cannot be worked out.
+    """
+    with open(jmx_path, 'r') as rf:
+        plan = rf.read()
+    variables = dict(VARIABLE_PATTERN.findall(plan))
+    threads, shared = 0.0, False
+    for group in THREAD_GROUP_PATTERN.findall(plan):
+        for value in NUM_THREADS_PATTERN.findall(group)[:1]:
+            try:
+                threads += float(re.sub(r'\$\{(\w+)\}', lambda match: variables.get(match.group(1), match.group(0)), value.strip()))
+            except ValueError:
+                shared = True
+    if shared:
+        try:
+            threads += float(variables.get('THREADS', ''))
+        except ValueError:
+            return None
+    return threads or None
+
+class TargetRate:
+    """
+    Intended request rate over the run, from Throughput Shaping Timer style rows of
+    (start tps, end tps, seconds): linear within a row, constant after the last one.
+    threads is the plan's thread count, used when the result file has no allThreads column.
+    """
+
+    def __init__(self, schedule, threads=None):
+        self.schedule = [tuple(map(float, row)) for row in schedule]
+        self.threads = threads
+        ends = np.cumsum([0.0] + [duration for _, _, duration in self.schedule])
+        self.times = np.repeat(ends, 2)[1:-1]
+        self.levels = np.array([level for start, end, _ in self.schedule for level in (start, end)])
+
+    def at(self, seconds):
+        return np.interp(seconds, self.times, self.levels)
+
+    @classmethod
+    def from_test_plan(cls, jmx_path):
+        return cls(test_plan_schedule(jmx_path), test_plan_threads(jmx_path))
+
+class JtlStats:
+    """
+    Per label accumulators for a JMeter result file: counts, sums, extremes and a response
+    time histogram. Memory grows with the number of labels, never with the number of samples.
+    With an interval (seconds) a Timeline of the same samples is collected in the same pass,
+    with cluster_errors the failed samples are grouped into ErrorClusters, and with a
+    TargetRate the response times are also corrected for coordinated omission. The correction
+    is dropped (correction_skipped) when neither the results nor the TargetRate give the
+    number of threads.
+    """
+
+    def __init__(self, interval=None, cluster_errors=False, target=None):
+        self.timeline = Timeline(interval) if interval else None
+        self.error_clusters = ErrorClusters() if cluster_errors else None
+        self.target = target
+        self.correction_skipped = False
+        self.run_start = None
+        # Synthetic samples for coordinated omission; corrected histogram = histogram + corrected
+        self.corrected = np.zeros((0, BUCKETS), dtype=np.int64) if target else None
+        self.labels = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.errors = np.zeros(0, dtype=np.int64)
+        self.elapsed_sum = np.zeros(0, dtype=np.float64)
+        self.elapsed_min = np.zeros(0, dtype=np.int64)
+        self.elapsed_max = np.zeros(0, dtype=np.int64)
+        self.first_start = np.zeros(0, dtype=np.int64)
+        self.last_end = np.zeros(0, dtype=np.int64)
+        self.received = np.zeros(0, dtype=np.float64)
+        self.sent = np.zeros(0, dtype=np.float64)
+        self.histogram = np.zeros((0, BUCKETS), dtype=np.int64)
+
+    def _grow(self, size):
+        extra = size - len(self.count)
+        if extra <= 0:
+            return
+        zeros = lambda array, fill=0: np.concatenate((array, np.full(extra, fill, dtype=array.dtype)))
+        self.count = zeros(self.count)
+        self.errors = zeros(self.errors)
+        self.elapsed_sum = zeros(self.elapsed_sum)
+        self.elapsed_min = zeros(self.elapsed_min, np.iinfo(np.int64).max)
+        self.elapsed_max = zeros(self.elapsed_max, np.iinfo(np.int64).min)
+        self.first_start = zeros(self.first_start, np.iinfo(np.int64).max)
+        self.last_end = zeros(self.last_end, np.iinfo(np.int64).min)
+        self.received = zeros(self.received)
+        self.sent = zeros(self.sent)
+        self.histogram = np.vstack((self.histogram, np.zeros((extra, BUCKETS), dtype=np.int64)))
+        if self.corrected is not None:
+            self.corrected = np.vstack((self.corrected, np.zeros((extra, BUCKETS), dtype=np.int64)))
+
+    def label_ids(self, labels):
+        """
+        Map a chunk's labels to stable label ids; only the distinct labels are looked up in Python.
+        """
+        unique, inverse = np.unique(labels, return_inverse=True)
+        ids = np.array([self.labels.setdefault(label, len(self.labels)) for label in unique.tolist()], dtype=np.int64)
+        self._grow(len(self.labels))
+        return ids[inverse.reshape(-1)]
+
+    def add(self, chunk):
+        """
+        Fold one parsed chunk (see parse_chunk) into the accumulators.
+        """
+        ids = self.label_ids(chunk['label'])
+        size = len(self.labels)
+        elapsed = chunk['elapsed']
+        self.count += np.bincount(ids, minlength=size)
+        self.errors += np.bincount(ids, weights=~chunk['success'], minlength=size).astype(np.int64)
+        self.elapsed_sum += np.bincount(ids, weights=elapsed, minlength=size)
+        np.minimum.at(self.elapsed_min, ids, elapsed)
+        np.maximum.at(self.elapsed_max, ids, elapsed)
+        np.minimum.at(self.first_start, ids, chunk['timeStamp'])
+        np.maximum.at(self.last_end, ids, chunk['timeStamp'] + elapsed)
+        self.received += np.bincount(ids, weights=chunk['bytes'], minlength=size)
+        self.sent += np.bincount(ids, weights=chunk['sentBytes'], minlength=size)
+        # Only the touched (label, bucket) cells are updated, whatever the number of labels
+        cells, counts = np.unique(ids * BUCKETS + bucket_index(elapsed), return_counts=True)
+        self.histogram.reshape(-1)[cells] += counts
+        if self.timeline:
+            self.timeline.add(chunk, ids)
+        if self.error_clusters:
+            self.error_clusters.add(chunk['failures'])
+        if self.target and chunk['allThreads'] is None and not self.target.threads:
+            self.target = self.corrected = None
+            self.correction_skipped = True
+        if self.target:
+            self.add_corrected(chunk, ids)
+
+    def add_corrected(self, chunk, ids):
+        """
+        Coordinated omission correction (as HdrHistogram's expected-interval recording): each
+        thread is meant to start a request every threads / target tps seconds, so a sample that
+        took L ms also stands for the requests that should have started meanwhile, recorded
+        as L - I, L - 2I, ... down to I.
+        """
+        if self.run_start is None:
+            self.run_start = int(chunk['timeStamp'].min())
+        rate = self.target.at((chunk['timeStamp'] - self.run_start) / 1000.0)
+        threads = np.maximum(chunk['allThreads'] if chunk['allThreads'] is not None else self.target.threads, 1)
+        interval = np.where(rate > 0, threads * 1000.0 / np.maximum(rate, 1e-9), np.inf)
+        elapsed = chunk['elapsed']
+        missed = np.clip(np.floor(elapsed / interval) - 1, 0, MAX_SYNTHETIC).astype(np.int64)
+
+        heavy = np.flatnonzero(missed)
+        if not len(heavy):
+            return
+        cumulative = np.cumsum(missed[heavy])
+        for part in np.split(heavy, np.searchsorted(cumulative, np.arange(SYNTHETIC_BATCH, cumulative[-1], SYNTHETIC_BATCH))):
+            repeats = missed[part]
+            owner = np.repeat(part, repeats)
+            step = np.arange(len(owner)) - np.repeat(np.cumsum(repeats) - repeats, repeats) + 1
+            values = (elapsed[owner] - step * interval[owner]).astype(np.int64)
+            cells, counts = np.unique(ids[owner] * BUCKETS + bucket_index(values), return_counts=True)
+            self.corrected.reshape(-1)[cells] += counts
+
+    def row(self, name, index, percentiles=None, corrected=None):
+        """
+        statistics.json entry for one label (index) or for all labels together (index None).
+        percentiles/corrected: precomputed raw and corrected (median, pct1, pct2, pct3), see
+        statistics(). Corrected values are only reported when coordinated omission is corrected.
+        """
+        pick = slice(None) if index is None else [index]
+        count = int(self.count[pick].sum())
+        errors = int(self.errors[pick].sum())
+        minimum = int(self.elapsed_min[pick].min())
+        maximum = int(self.elapsed_max[pick].max())
+        histogram = self.histogram[pick].sum(axis=0) if percentiles is None else None
+        median, pct1, pct2, pct3 = percentiles or histogram_percentiles(histogram, (50,) + PERCENTILES, minimum, maximum)
+        duration = max(int(self.last_end[pick].max()) - int(self.first_start[pick].min()), 1) / 1000.0
+        result = {
+            "transaction": name,
+            "sampleCount": count,
+            "errorCount": errors,
+            "errorPct": errors * 100.0 / count,
+            "meanResTime": float(self.elapsed_sum[pick].sum()) / count,
+            "medianResTime": median,
+            "minResTime": float(minimum),
+            "maxResTime": float(maximum),
+            "pct1ResTime": pct1,
+            "pct2ResTime": pct2,
+            "pct3ResTime": pct3,
+            "throughput": count / duration,
+            "receivedKBytesPerSec": float(self.received[pick].sum()) / 1024.0 / duration,
+            "sentKBytesPerSec": float(self.sent[pick].sum()) / 1024.0 / duration,
+        }
+        if self.corrected is not None:
+            if corrected is None:
+                histogram = self.histogram[pick].sum(axis=0) + self.corrected[pick].sum(axis=0)
+                corrected = histogram_percentiles(histogram, (50,) + PERCENTILES, minimum, maximum)
+            for field, value in zip(CORRECTED_FIELDS, corrected):
+                result[field] = value
+        return result
+
+    def merge(self, other):
+        """
+        Add another JtlStats (e.g. from a second load generator) into this one. Histograms are
+        summed bucket by bucket, so merged percentiles are as accurate as single-node ones.
+        """
+        ids = np.array([self.labels.setdefault(label, len(self.labels)) for label in other.labels], dtype=np.int64)
+        self._grow(len(self.labels))
+        source = np.array(list(other.labels.values()), dtype=np.int64)
+        for name in ('count', 'errors', 'elapsed_sum', 'received', 'sent', 'histogram'):
+            getattr(self, name)[ids] += getattr(other, name)[source]
+        # A node without correction contributes no synthetic samples
+        if other.corrected is not None:
+            if self.corrected is None:
+                self.corrected = np.zeros_like(self.histogram)
+            self.corrected[ids] += other.corrected[source]
+        self.elapsed_min[ids] = np.minimum(self.elapsed_min[ids], other.elapsed_min[source])
+        self.elapsed_max[ids] = np.maximum(self.elapsed_max[ids], other.elapsed_max[source])
+        self.first_start[ids] = np.minimum(self.first_start[ids], other.first_start[source])
+        self.last_end[ids] = np.maximum(self.last_end[ids], other.last_end[source])
+
+    def to_sketch(self):
+        """
+        Compact, mergeable summary of this node's results: the scalar accumulators plus the
+        non-empty histogram buckets of every label.
+        """
+        labels = {}
+        for label, index in self.labels.items():
+            buckets = np.flatnonzero(self.histogram[index])
+            labels[label] = {
+                'count': int(self.count[index]),
+                'errors': int(self.errors[index]),
+                'elapsed_sum': float(self.elapsed_sum[index]),
+                'elapsed_min': int(self.elapsed_min[index]),
+                'elapsed_max': int(self.elapsed_max[index]),
+                'first_start': int(self.first_start[index]),
+                'last_end': int(self.last_end[index]),
+                'received': float(self.received[index]),
+                'sent': float(self.sent[index]),
+                'buckets': buckets.tolist(),
+                'counts': self.histogram[index, buckets].tolist(),
+            }
+            if self.corrected is not None:
+                buckets = np.flatnonzero(self.corrected[index])
+                labels[label]['corrected_buckets'] = buckets.tolist()
+                labels[label]['corrected_counts'] = self.corrected[index, buckets].tolist()
+        return {'version': SKETCH_VERSION, 'sub_buckets': SUB_BUCKETS, 'max_shift': MAX_SHIFT, 'labels': labels}
+
+    @classmethod
+    def from_sketch(cls, sketch):
+        if (sketch.get('version'), sketch.get('sub_buckets'), sketch.get('max_shift')) != (SKETCH_VERSION, SUB_BUCKETS, MAX_SHIFT):
+            raise ValueError("Sketch was written with a different histogram layout")
+        stats = cls()
+        if any('corrected_buckets' in entry for entry in sketch['labels'].values()):
+            stats.corrected = np.zeros((0, BUCKETS), dtype=np.int64)
+        stats._grow(len(sketch['labels']))
+        for index, (label, entry) in enumerate(sketch['labels'].items()):
+            stats.labels[label] = index
+            for name in ('count', 'errors', 'elapsed_sum', 'elapsed_min', 'elapsed_max', 'first_start', 'last_end', 'received', 'sent'):
+                getattr(stats, name)[index] = entry[name]
+            stats.histogram[index, entry['buckets']] = entry['counts']
+            if 'corrected_buckets' in entry:
+                stats.corrected[index, entry['corrected_buckets']] = entry['corrected_counts']
+        return stats
+
+    def statistics(self):
+        """
+        The same structure as JMeter's dashboard statistics.json: one entry per label plus "Total".
+        """
+        result = {"Total": self.row("Total", None)} if self.labels else {}
+        percentiles = percentile_matrix(self.histogram, (50,) + PERCENTILES)
+        percentiles = np.clip(percentiles, self.elapsed_min[:, None], self.elapsed_max[:, None]).tolist()
+        corrected = [None] * len(percentiles)
+        if self.corrected is not None:
+            corrected = percentile_matrix(self.histogram + self.corrected, (50,) + PERCENTILES)
+            corrected = np.clip(corrected, self.elapsed_min[:, None], self.elapsed_max[:, None]).tolist()
+        for label, index in sorted(self.labels.items()):
+            result[label] = self.row(label, index, percentiles[index], corrected[index])
+        return result
+
+def parse_chunk(rows, columns):
+    """
+    Turn a list of CSV rows into NumPy columns. Only the needed fields are pulled out
+    (map/itemgetter run in C) and numbers are converted straight into int64 arrays.
+    """
+    text = lambda name: list(map(itemgetter(columns[name]), rows))
+    numeric = lambda name: (np.fromiter(map(int, text(name)), dtype=np.int64, count=len(rows)) if name in columns
+                            else np.zeros(len(rows), dtype=np.int64))
+    chunk = {
+        'timeStamp': numeric('timeStamp'),
+        'elapsed': numeric('elapsed'),
+        'label': np.array(text('label')),
+        'success': np.array(text('success')) == 'true',
+        'bytes': numeric('bytes'),
+        'sentBytes': numeric('sentBytes'),
+        'allThreads': numeric('allThreads') if 'allThreads' in columns else None,
+    }
+
+    # Text of the failed samples only; failures are usually a small share of the rows
+    failed = np.flatnonzero(~chunk['success']).tolist()
+    field = lambda name: [rows[index][columns[name]] for index in failed] if name in columns else [''] * len(failed)
+    messages = [failure or response for failure, response in zip(field('failureMessage'), field('responseMessage'))]
+    chunk['failures'] = {
+        'timeStamp': chunk['timeStamp'][failed],
+        'label': np.array(field('label'), dtype=str),
+        'responseCode': np.array(field('responseCode'), dtype=str),
+        'message': np.array(messages, dtype=str),
+    }
+    return chunk
+
+def iter_chunks(jtl_path, chunk_rows=CHUNK_ROWS):
+    """
+    Read a CSV result file and yield parsed chunks of at most chunk_rows samples.
+    Rows whose field count does not match the header (e.g. a truncated last line) are skipped.
+    """
+    with open(jtl_path, 'r', newline='', encoding='utf-8', errors='replace') as rf:
+        reader = csv.reader(rf)
+        header = next(reader, None)
+        if header is None:
+            return
+        if 'timeStamp' not in header:
+            rows = [header]
+            header = DEFAULT_FIELDS[:len(header)]
+        else:
+            rows = []
+        columns = {name: position for position, name in enumerate(header)}
+        for required in ('timeStamp', 'elapsed', 'label', 'success'):
+            if required not in columns:
+                raise ValueError(f"Result file has no '{required}' column")
+
+        width = len(header)
+        while True:
+            rows.extend(islice(reader, chunk_rows - len(rows)))
+            if not rows:
+                return
+            rows = [row for row in rows if len(row) == width]
+            if rows:
+                yield parse_chunk(rows, columns)
+            rows = []
+
+def analyze(jtl_path, chunk_rows=CHUNK_ROWS, interval=None, cluster_errors=False, target=None):
+    """
+    Stream a result file into a JtlStats (with a Timeline when interval is given, ErrorClusters
+    with cluster_errors and coordinated omission correction with a TargetRate).
+    """
+    stats = JtlStats(interval, cluster_errors, target)
+    for chunk in iter_chunks(jtl_path, chunk_rows):
+        stats.add(chunk)
+    return stats
+
+def merge_sketches(paths):
+    """
+    Merge the sketch files written by each load generator into one JtlStats.
+    """
+    stats = JtlStats()
+    for path in paths:
+        with open(path, 'r') as rf:
+            stats.merge(JtlStats.from_sketch(json.load(rf)))
+    return stats
+
+def main(jtl_path, output, sketch=None, timeline=None, interval=10, errors=None, top=20, target_tps=None, target_duration=None, test_plan=None):
+    started = time.perf_counter()
+    try:
+        target = None
+        if test_plan:
+            target = TargetRate.from_test_plan(test_plan)
+        elif target_tps:
+            start, _, end = target_tps.partition(':')
+            target = TargetRate([(start, end or start, target_duration or 0)])
+        stats = analyze(jtl_path, interval=interval if timeline else None, cluster_errors=bool(errors), target=target)
+    except (OSError, ValueError) as e:
+        print(f"Error analyzing '{jtl_path}': {e}", file=sys.stderr)
+        sys.exit(1)
+    if stats.correction_skipped:
+        print(f"Warning: '{jtl_path}' has no allThreads column and the number of threads is unknown "
+              f"(use --test-plan); response times are not corrected for coordinated omission", file=sys.stderr)
+
+    with open(output, 'w') as wf:
+        json.dump(stats.statistics(), wf, indent=4)
+    if sketch:
+        with open(sketch, 'w') as wf:
+            json.dump(stats.to_sketch(), wf, separators=(',', ':'))
+    if timeline:
+        with open(timeline, 'w') as wf:
+            # dumps uses the C encoder, json.dump the pure Python one
+            wf.write(json.dumps({'interval': interval, 'series': stats.timeline.series(stats.labels)}, separators=(',', ':')))
+    if errors:
+        with open(errors, 'w') as wf:
+            json.dump(stats.error_clusters.top(top), wf, indent=4)
+    print(f"Analyzed {int(stats.count.sum())} samples in {time.perf_counter() - started:.2f}s, statistics written to '{output}'")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compute statistics.json from a JMeter CSV result file (JTL) in one streaming pass.")
+    parser.add_argument("jtl_file", help="JMeter CSV result file")
+    parser.add_argument("--output", default="statistics.json", help="Where to write the statistics (default: statistics.json)")
+    parser.add_argument("--sketch", help="Also write a mergeable histogram sketch to this file (one per load generator)")
+    parser.add_argument("--timeline", help="Also write per-window throughput, error and percentile series to this file")
+    parser.add_argument("--interval", type=float, default=10, help="Timeline window in seconds (default: 10)")
+    parser.add_argument("--errors", help="Also write the largest failure clusters (label, response code, message) to this file")
+    parser.add_argument("--top", type=int, default=20, help="Number of failure clusters to report (default: 20)")
+    parser.add_argument("--target-tps", help="Correct for coordinated omission against this intended rate: TPS or START:END (ramp)")
+    parser.add_argument("--target-duration", type=float, help="Seconds over which --target-tps ramps from START to END")
+    parser.add_argument("--test-plan", help="Correct for coordinated omission using the load profile of this JMX (its enabled Throughput Shaping Timer)")
+    args = parser.parse_args()
+
+    main(args.jtl_file, args.output, args.sketch, args.timeline, args.interval, args.errors, args.top,
+         args.target_tps, args.target_duration, args.test_plan)
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+########### Global Declarations #########
+
+# File layout: a fixed size header (magic + JSON field list, space padded), then fixed-width
+# little-endian records, so the records can be memory-mapped and appended without rewriting
+MAGIC = b"NFEMETR1"
+HEADER_SIZE = 4096
+STORE_VERSION = 1
+
+# Records kept in memory before they are written out
+BUFFER_RECORDS = 256
+
+
+########### Code  #########
+
+def record_dtype(fields):
+    """
+    Structured dtype of [(name, format)] fields; formats are forced to little-endian.
+    """
+    return np.dtype([(name, np.dtype(fmt).newbyteorder("<")) for name, fmt in fields])
+
+def encode_header(fields, meta=None):
+    header = json.dumps({"version": STORE_VERSION, "fields": [[name, np.dtype(fmt).newbyteorder("<").str] for name, fmt in fields],
+                         "meta": meta or {}}, separators=(",", ":")).encode()
+    if len(MAGIC) + len(header) + 1 > HEADER_SIZE:
+        raise ValueError(f"metrics header is larger than {HEADER_SIZE} bytes")
+    return MAGIC + header.ljust(HEADER_SIZE - len(MAGIC) - 1) + b"\n"
+
+def read_header(path):
+    """
+    (fields, meta) stored in the header of a metrics file.
+    """
+    with open(path, "rb") as rf:
+        raw = rf.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or not raw.startswith(MAGIC):
+        raise ValueError(f"'{path}' is not a metrics file")
+    header = json.loads(raw[len(MAGIC):].decode())
+    if header["version"] != STORE_VERSION:
+        raise ValueError(f"'{path}' uses metrics file version {header['version']}, expected {STORE_VERSION}")
+    return [tuple(field) for field in header["fields"]], header["meta"]
+
+class MetricsWriter:
+    """
+    Append fixed-width records to a metrics file. At most buffer_records samples are held in
+    memory; they are written out (and flushed) when the buffer fills and on close.
+    """
+
+    def __init__(self, path, fields, meta=None, append=False, buffer_records=BUFFER_RECORDS):
+        self.path = path
+        self.fields = fields
+        self.meta = dict(meta or {})
+        self.dtype = record_dtype(fields)
+        if append and os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            stored, stored_meta = read_header(path)
+            self.meta = dict(stored_meta, **self.meta)
+            if record_dtype(stored) != self.dtype:
+                raise ValueError(f"'{path}' has fields {[name for name, _ in stored]}, expected {list(self.dtype.names)}")
+            # Drop a partial record left by an interrupted write
+            size = os.path.getsize(path)
+            with open(path, "r+b") as wf:
+                wf.truncate(size - (size - HEADER_SIZE) % self.dtype.itemsize)
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(encode_header(fields, meta))
+            self.file.flush()
+        self.buffer = np.zeros(buffer_records, dtype=self.dtype)
+        self.pending = 0
+
+    def append(self, record):
+        """
+        Add one sample: a tuple in field order.
+        """
+        self.buffer[self.pending] = record
+        self.pending += 1
+        if self.pending == len(self.buffer):
+            self.flush()
+
+    def extend(self, records):
+        """
+        Add many samples at once: a structured array with this writer's dtype.
+        """
+        self.flush()
+        self.file.write(np.ascontiguousarray(records, dtype=self.dtype).tobytes())
+        self.file.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(self.buffer[:self.pending].tobytes())
+            self.pending = 0
+        self.file.flush()
+
+    def update_meta(self, meta):
+        """
+        Merge meta into the header; the header has a fixed size, so it is rewritten in place.
+        """
+        self.meta.update(meta)
+        self.flush()
+        with open(self.path, "r+b") as wf:
+            wf.write(encode_header(self.fields, self.meta))
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_metrics(path):
+    """
+    Read-only memory map of all complete records of a metrics file, as a structured array
+    (empty when nothing was recorded yet). Safe to call while a writer is still appending.
+    """
+    fields, _ = read_header(path)
+    dtype = record_dtype(fields)
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count <= 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+def write_csv(path, records):
+    with open(path, "w") as wf:
+        wf.write(",".join(records.dtype.names) + "\n")
+        np.savetxt(wf, np.column_stack([records[name].astype(np.float64) for name in records.dtype.names]), delimiter=",", fmt="%.15g")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a sustainability metrics file.")
+    parser.add_argument("metrics_file", help="Metrics file written by sustainability.py")
+    parser.add_argument("--csv", help="Also write all records to this CSV file")
+    args = parser.parse_args()
+
+    try:
+        fields, meta = read_header(args.metrics_file)
+        records = read_metrics(args.metrics_file)
+    except (OSError, ValueError) as e:
+        print(f"Error reading metrics: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{len(records)} records, fields: {', '.join(name for name, _ in fields)}")
+    for key, value in meta.items():
+        print(f"{key}: {value}")
+    if args.csv:
+        write_csv(args.csv, records)
+        print(f"Records written to '{args.csv}'")
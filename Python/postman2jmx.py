@@ -2,16 +2,26 @@ import json
 import re
 import sys
 import logging
+import math
 import os
 import argparse
+import hashlib
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+import yaml
+
+import correlation
+import postman_stream
+from correlation import plan_correlations, substitute_values
+from postman_stream import iter_collection
 
 logging.basicConfig(level=logging.INFO)
 
 ########### Global Declarations #########
-variablefile = None
-globalvariablefile = None
-itr_jmx = ''
-itr_final_jmx = ''
 
 baseline_jmx = r"""
 <?xml version="1.0" encoding="UTF-8"?>
@@ -37,31 +47,31 @@ baseline_jmx = r"""
                 <collectionProp name="Arguments.arguments">
                     <elementProp name="THREADS" elementType="Argument">
                         <stringProp name="Argument.name">THREADS</stringProp>
-                        <stringProp name="Argument.value">10</stringProp>
+                        <stringProp name="Argument.value">MY-THREADS</stringProp>
                         <stringProp name="Argument.metadata">=</stringProp>
                         <stringProp name="Argument.desc">Change as per requirement</stringProp>
                     </elementProp>
                     <elementProp name="THREADS_RAMPUP_TIME" elementType="Argument">
                         <stringProp name="Argument.name">THREADS_RAMPUP_TIME</stringProp>
-                        <stringProp name="Argument.value">10</stringProp>
+                        <stringProp name="Argument.value">MY-RAMPUP-TIME</stringProp>
                         <stringProp name="Argument.desc">Value in seconds - Change as per requirement</stringProp>
                         <stringProp name="Argument.metadata">=</stringProp>
                     </elementProp>
                     <elementProp name="START_TPS" elementType="Argument">
                         <stringProp name="Argument.name">START_TPS</stringProp>
-                        <stringProp name="Argument.value">5</stringProp>
+                        <stringProp name="Argument.value">MY-START-TPS</stringProp>
                         <stringProp name="Argument.metadata">=</stringProp>
                         <stringProp name="Argument.desc">Change as per requirement</stringProp>
                     </elementProp>
                     <elementProp name="END_TPS" elementType="Argument">
                         <stringProp name="Argument.name">END_TPS</stringProp>
-                        <stringProp name="Argument.value">5</stringProp>
+                        <stringProp name="Argument.value">MY-END-TPS</stringProp>
                         <stringProp name="Argument.metadata">=</stringProp>
                         <stringProp name="Argument.desc">Change as per requirement</stringProp>
                     </elementProp>
                     <elementProp name="TEST_DURATION" elementType="Argument">
                         <stringProp name="Argument.name">TEST_DURATION</stringProp>
-                        <stringProp name="Argument.value">60</stringProp>
+                        <stringProp name="Argument.value">MY-TEST-DURATION</stringProp>
                         <stringProp name="Argument.metadata">=</stringProp>
                         <stringProp name="Argument.desc">Value in seconds - Change as per requirement</stringProp>
                     </elementProp>
@@ -69,7 +79,7 @@ baseline_jmx = r"""
                 </collectionProp>
                 <stringProp name="TestPlan.comments">EDIT ALL VARIABLES HERE!</stringProp>
             </Arguments>
-            <hashTree/>
+            <hashTree/>MY-CSV-DATA-SET
             <ResponseAssertion guiclass="AssertionGui" testclass="ResponseAssertion" testname="Global Response Assertion" enabled="true">
                 <collectionProp name="Asserion.test_strings">
                     <stringProp name="1538630">20\d</stringProp>
@@ -80,13 +90,8 @@ baseline_jmx = r"""
                 <intProp name="Assertion.test_type">2</intProp>
             </ResponseAssertion>
             <hashTree/>
-            <kg.apc.jmeter.timers.VariableThroughputTimer guiclass="kg.apc.jmeter.timers.VariableThroughputTimerGui" testclass="kg.apc.jmeter.timers.VariableThroughputTimer" testname="LOAD / SOAK TEST - Throughput Shaping Timer" enabled="true">
-                <collectionProp name="load_profile">
-                    <collectionProp name="731866749">
-                        <stringProp name="1606799354">${START_TPS}</stringProp>
-                        <stringProp name="779619553">${END_TPS}</stringProp>
-                        <stringProp name="-1857560941">${TEST_DURATION}</stringProp>
-                    </collectionProp>
+            <kg.apc.jmeter.timers.VariableThroughputTimer guiclass="kg.apc.jmeter.timers.VariableThroughputTimerGui" testclass="kg.apc.jmeter.timers.VariableThroughputTimer" testname="MY-PROFILE-NAME - Throughput Shaping Timer" enabled="true">
+                <collectionProp name="load_profile">MY-LOAD-PROFILE
                 </collectionProp>
             </kg.apc.jmeter.timers.VariableThroughputTimer>
             <hashTree/>
@@ -168,6 +173,12 @@ baseline_jmx = r"""
         <stringProp name="classname">org.datadog.jmeter.plugins.DatadogBackendClient</stringProp>
       </BackendListener>
       <hashTree/>
+MY-LISTENERS
+BASELINE_JMX_FIND
+"""
+
+# GUI listeners kept in the default plan for interactive runs
+gui_listeners_jmx = r"""
             <ResultCollector guiclass="SummaryReport" testclass="ResultCollector" testname="Summary Report" enabled="true">
                 <boolProp name="ResultCollector.error_logging">false</boolProp>
                 <objProp>
@@ -239,19 +250,98 @@ baseline_jmx = r"""
                 <stringProp name="filename"></stringProp>
             </ResultCollector>
             <hashTree/>
-            <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Thread Group" enabled="true">
+"""
+
+# Load mode drops every listener; results go to the -l file using these save settings
+load_mode_properties = """# Lean result saving for non-GUI load runs (pass to jmeter with -q)
+jmeter.save.saveservice.output_format=csv
+jmeter.save.saveservice.print_field_names=true
+jmeter.save.saveservice.timestamp_format=ms
+jmeter.save.saveservice.time=true
+jmeter.save.saveservice.label=true
+jmeter.save.saveservice.response_code=true
+jmeter.save.saveservice.response_message=true
+jmeter.save.saveservice.successful=true
+jmeter.save.saveservice.thread_name=true
+jmeter.save.saveservice.thread_counts=true
+jmeter.save.saveservice.bytes=true
+jmeter.save.saveservice.sent_bytes=true
+jmeter.save.saveservice.latency=true
+jmeter.save.saveservice.connect_time=true
+jmeter.save.saveservice.assertion_results_failure_message=true
+jmeter.save.saveservice.data_type=false
+jmeter.save.saveservice.encoding=false
+jmeter.save.saveservice.url=false
+jmeter.save.saveservice.hostname=false
+jmeter.save.saveservice.idle_time=false
+jmeter.save.saveservice.subresults=false
+jmeter.save.saveservice.assertions=false
+jmeter.save.saveservice.assertion_results=none
+jmeter.save.saveservice.response_data=false
+jmeter.save.saveservice.response_data.on_error=false
+jmeter.save.saveservice.samplerData=false
+jmeter.save.saveservice.requestHeaders=false
+jmeter.save.saveservice.responseHeaders=false
+jmeter.save.saveservice.filename=false
+jmeter.save.saveservice.autoflush=false
+"""
+
+csv_data_set_jmx = r"""
+            <CSVDataSet guiclass="TestBeanGUI" testclass="CSVDataSet" testname="CSV Data Set Config - MY-CSV-FILE" enabled="true">
+                <stringProp name="filename">MY-CSV-FILE</stringProp>
+                <stringProp name="fileEncoding">UTF-8</stringProp>
+                <stringProp name="variableNames">MY-CSV-VARIABLES</stringProp>
+                <boolProp name="ignoreFirstLine">true</boolProp>
+                <stringProp name="delimiter">MY-CSV-DELIMITER</stringProp>
+                <boolProp name="quotedData">true</boolProp>
+                <boolProp name="recycle">true</boolProp>
+                <boolProp name="stopThread">false</boolProp>
+                <stringProp name="shareMode">shareMode.MY-CSV-SHARE-MODE</stringProp>
+            </CSVDataSet>
+            <hashTree/>"""
+
+load_profile_row_jmx = r"""
+                    <collectionProp name="MY-ROW-ID">
+                        <stringProp name="MY-ROW-START-ID">MY-ROW-START</stringProp>
+                        <stringProp name="MY-ROW-END-ID">MY-ROW-END</stringProp>
+                        <stringProp name="MY-ROW-DURATION-ID">MY-ROW-DURATION</stringProp>
+                    </collectionProp>"""
+
+thread_group_jmx = r"""
+            <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="MY-TG-NAME" enabled="true">
                 <stringProp name="ThreadGroup.on_sample_error">startnextloop</stringProp>
                 <elementProp name="ThreadGroup.main_controller" elementType="LoopController" guiclass="LoopControlPanel" testclass="LoopController" testname="Loop Controller" enabled="true">
                     <boolProp name="LoopController.continue_forever">1</boolProp>
                     <intProp name="LoopController.loops">1</intProp>
                 </elementProp>
-                <stringProp name="ThreadGroup.num_threads">${THREADS}</stringProp>
+                <stringProp name="ThreadGroup.num_threads">MY-TG-THREADS</stringProp>
                 <stringProp name="ThreadGroup.ramp_time">${THREADS_RAMPUP_TIME}</stringProp>
                 <boolProp name="ThreadGroup.scheduler">false</boolProp>
                 <stringProp name="ThreadGroup.duration"></stringProp>
                 <stringProp name="ThreadGroup.delay"></stringProp>
                 <boolProp name="ThreadGroup.same_user_on_next_iteration">false</boolProp>
-BASELINE_JMX_FIND
+            </ThreadGroup>
+            <hashTree>
+"""
+
+constant_throughput_timer_jmx = r"""
+                <ConstantThroughputTimer guiclass="TestBeanGUI" testclass="ConstantThroughputTimer" testname="Throughput Target - MY-TG-NAME" enabled="true">
+                    <intProp name="calcMode">4</intProp>
+                    <doubleProp>
+                        <name>throughput</name>
+                        <value>MY-TG-THROUGHPUT</value>
+                        <savedValue>0.0</savedValue>
+                    </doubleProp>
+                </ConstantThroughputTimer>
+                <hashTree/>
+"""
+
+transaction_controller_jmx = r"""
+<TransactionController guiclass="TransactionControllerGui" testclass="TransactionController" testname="MY-TC-NAME" enabled="true">
+    <boolProp name="TransactionController.includeTimers">false</boolProp>
+    <boolProp name="TransactionController.parent">false</boolProp>
+</TransactionController>
+<hashTree>
 """
 
 TG_TC_HTTPSampler_jmx = r"""
@@ -269,7 +359,6 @@ TG_TC_HTTPSampler_jmx = r"""
     <stringProp name="HTTPSampler.embedded_url_re"></stringProp>
     <stringProp name="HTTPSampler.connect_timeout"></stringProp>
     <stringProp name="HTTPSampler.response_timeout"></stringProp>
-    MY-URL-PARAM
 </HTTPSamplerProxy>
 """
 
@@ -281,9 +370,37 @@ headerStringStart_jmx = r"""
 headerStringEnd_jmx = r"""
 </collectionProp>
 </HeaderManager>
-<hashTree/></hashTree>
+<hashTree/>
+"""
+
+json_extractor_jmx = r"""
+    <JSONPostProcessor guiclass="JSONPostProcessorGui" testclass="JSONPostProcessor" testname="Extract MY-VAR-NAME" enabled="true">
+        <stringProp name="JSONPostProcessor.referenceNames">MY-VAR-NAME</stringProp>
+        <stringProp name="JSONPostProcessor.jsonPathExprs">MY-EXPRESSION</stringProp>
+        <stringProp name="JSONPostProcessor.match_numbers">1</stringProp>
+        <stringProp name="JSONPostProcessor.defaultValues">MY-VAR-NAME_NOT_FOUND</stringProp>
+    </JSONPostProcessor>
+    <hashTree/>
+"""
+
+regex_extractor_jmx = r"""
+    <RegexExtractor guiclass="RegexExtractorGui" testclass="RegexExtractor" testname="Extract MY-VAR-NAME" enabled="true">
+        <stringProp name="RegexExtractor.useHeaders">true</stringProp>
+        <stringProp name="RegexExtractor.refname">MY-VAR-NAME</stringProp>
+        <stringProp name="RegexExtractor.regex">MY-EXPRESSION</stringProp>
+        <stringProp name="RegexExtractor.template">$1$</stringProp>
+        <stringProp name="RegexExtractor.default">MY-VAR-NAME_NOT_FOUND</stringProp>
+        <stringProp name="RegexExtractor.match_number">1</stringProp>
+    </RegexExtractor>
+    <hashTree/>
 """
 
+header_jmx = r"""
+                <elementProp name="" elementType="Header">
+                    <stringProp name="Header.name">MY-HEADER-NAME</stringProp>
+                    <stringProp name="Header.value">MY-HEADER-VALUE</stringProp>
+                </elementProp>"""
+
 raw_body_part = r"""
 <boolProp name="HTTPSampler.postBodyRaw">true</boolProp>
 <elementProp name="HTTPsampler.Arguments" elementType="Arguments">
@@ -299,316 +416,910 @@ raw_body_part = r"""
 
 without_body_part = r"""
 <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" testname="User Defined Variables" enabled="true">
-    <collectionProp name="Arguments.arguments"/>
+    <collectionProp name="Arguments.arguments">MY-ARGUMENTS</collectionProp>
 </elementProp>
 """
 
-BASELINE_JMX_TEMPLATE = '</ThreadGroup>'+ '<hashTree>'+ itr_final_jmx + '</hashTree>'+ '</hashTree>   </hashTree> </jmeterTestPlan>'
+http_argument_jmx = r"""
+        <elementProp name="MY-ARG-NAME" elementType="HTTPArgument">
+            <boolProp name="HTTPArgument.always_encode">MY-ARG-ENCODE</boolProp>
+            <stringProp name="Argument.value">MY-ARG-VALUE</stringProp>
+            <stringProp name="Argument.metadata">=</stringProp>
+            <boolProp name="HTTPArgument.use_equals">true</boolProp>
+            <stringProp name="Argument.name">MY-ARG-NAME</stringProp>
+        </elementProp>"""
+
+user_defined_variable_jmx = r"""
+                    <elementProp name="MY-VAR-NAME" elementType="Argument">
+                        <stringProp name="Argument.name">MY-VAR-NAME</stringProp>
+                        <stringProp name="Argument.value">MY-VAR-VALUE</stringProp>
+                        <stringProp name="Argument.metadata">=</stringProp>
+                        <stringProp name="Argument.desc">MY-VAR-DESC</stringProp>
+                    </elementProp>"""
+
+# Closes a Thread Group / Transaction Controller hashTree, and the test plan after the last group
+close_hash_tree_jmx = '</hashTree>\n'
+baseline_tail_jmx = '        </hashTree>\n    </hashTree>\n</jmeterTestPlan>\n'
+
+# Share of ${THREADS} given to a weighted thread group
+weighted_threads_jmx = '${__groovy(Math.max(1\\, Math.round((${THREADS} * MY-WEIGHT / ${WORKLOAD_WEIGHT_TOTAL}) as double)) as int)}'
+
+# Placeholders understood by render_template
+TEMPLATE_TOKEN = re.compile(r'MY-[A-Z-]+|DYNAMIC-BODY-PART|BASELINE_JMX_FIND')
+
+# Thread Group used for requests outside any per-folder group
+DEFAULT_THREAD_GROUP = 'Thread Group'
+
+# --cache-dir is pruned to this size after every conversion, least recently used entries first
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Export suffixes stripped from a collection's file name to name its JMX
+COLLECTION_SUFFIXES = ('.postman_collection.json', '.json')
+
+# Keys of the tests.postman section in configfile.yml that shape the generated plan
+OPTION_KEYS = ('transaction_controllers', 'thread_group_per_folder', 'workload', 'load_mode', 'correlation', 'csv_data')
+
+# Plan defaults used when configfile.yml has no tests.jmeter.load_profile
+DEFAULT_PLAN = {
+    'MY-THREADS': '10',
+    'MY-RAMPUP-TIME': '10',
+    'MY-START-TPS': '5',
+    'MY-END-TPS': '5',
+    'MY-TEST-DURATION': '60',
+    'MY-PROFILE-NAME': 'LOAD / SOAK TEST',
+    'rows': [('${START_TPS}', '${END_TPS}', '${TEST_DURATION}')],
+}
 
-# Global variables
+# Postman {{variable}} references
+POSTMAN_VARIABLE = re.compile(r'\{\{([^{}]+)\}\}')
+
+# Postman dynamic variables mapped to the closest JMeter functions
+DYNAMIC_VARIABLES = {
+    '$guid': '${__UUID()}',
+    '$randomUUID': '${__UUID()}',
+    '$timestamp': '${__time(/1000,)}',
+    '$isoTimestamp': "${__time(yyyy-MM-dd'T'HH:mm:ss.SSS'Z',)}",
+    '$randomInt': '${__Random(0,1000)}',
+}
 
 
 ########### Code  #########
 
+def compile_template(template):
+    """
+    Splits a template once into literal chunks and placeholder names so that every
+    render is a single join instead of one str.replace pass per placeholder.
+    """
+    return TEMPLATE_TOKEN.split(template), TEMPLATE_TOKEN.findall(template)
+
+def render_template(compiled, values):
+    """
+    Renders a compiled template, substituting each placeholder from values ('' if missing).
+    """
+    chunks, names = compiled
+    rendered = [chunks[0]]
+    for name, chunk in zip(names, chunks[1:]):
+        rendered.append(values.get(name, ''))
+        rendered.append(chunk)
+    return ''.join(rendered)
+
+def xml_escape(value):
+    """
+    Escapes a value for use inside JMX element text or attribute values.
+    """
+    return escape(str(value), {'"': '&quot;'})
+
+# Templates are compiled once at import time and reused for every request
+baseline_head_compiled = compile_template(baseline_jmx.lstrip().replace('BASELINE_JMX_FIND', ''))
+csv_data_set_compiled = compile_template(csv_data_set_jmx)
+load_profile_row_compiled = compile_template(load_profile_row_jmx)
+thread_group_compiled = compile_template(thread_group_jmx)
+constant_throughput_timer_compiled = compile_template(constant_throughput_timer_jmx)
+transaction_controller_compiled = compile_template(transaction_controller_jmx)
+json_extractor_compiled = compile_template(json_extractor_jmx)
+regex_extractor_compiled = compile_template(regex_extractor_jmx)
+weighted_threads_compiled = compile_template(weighted_threads_jmx)
+sampler_compiled = compile_template(TG_TC_HTTPSampler_jmx)
+header_compiled = compile_template(header_jmx)
+raw_body_compiled = compile_template(raw_body_part)
+without_body_compiled = compile_template(without_body_part)
+http_argument_compiled = compile_template(http_argument_jmx)
+user_defined_variable_compiled = compile_template(user_defined_variable_jmx)
+
 def add_headers(headers):
     """
     Generates JMX header string for the given headers.
     """
-    header_string_mid = ""
+    header_string_mid = []
     try:
         for header in headers:
             if not header.get('disabled', False):  # Only process enabled headers
-                header_to_add = (
-                    '                <elementProp name="" elementType="Header">'
-                    f'                   <stringProp name="Header.name">{header["key"]}</stringProp>'
-                    f'                   <stringProp name="Header.value">{header["value"]}</stringProp>'
-                    '                 </elementProp>'
-                )
-                header_string_mid += header_to_add
+                header_string_mid.append(render_template(header_compiled, {
+                    'MY-HEADER-NAME': xml_escape(header['key']),
+                    'MY-HEADER-VALUE': xml_escape(header['value']),
+                }))
     except Exception as e:
         logging.error(f"Error while processing headers: {e}")
-    return header_string_mid
+    return ''.join(header_string_mid)
 
-def add_query_params(query_params):
+def add_query_params(query_params, always_encode=True):
     """
     Generates JMX query parameter string for the given query parameters.
     """
-    param_string_mid = ""
+    param_string_mid = []
     try:
         for param in query_params:
             if not param.get('disabled', False):  # Only process enabled parameters
-                param_to_add = (
-                    f'<elementProp name="{param["key"]}" elementType="HTTPArgument">'
-                    ' <boolProp name="HTTPArgument.always_encode">true</boolProp>'
-                    f' <stringProp name="Argument.value">{param["value"]}</stringProp>'
-                    ' <stringProp name="Argument.metadata">=</stringProp>'
-                    ' <boolProp name="HTTPArgument.use_equals">true</boolProp>'
-                    f' <stringProp name="Argument.name">{param["key"]}</stringProp>'
-                    ' </elementProp>'
-                )
-                param_string_mid += param_to_add
+                param_string_mid.append(render_template(http_argument_compiled, {
+                    'MY-ARG-NAME': xml_escape(param['key']),
+                    'MY-ARG-VALUE': xml_escape(param.get('value') or ''),
+                    'MY-ARG-ENCODE': 'true' if always_encode else 'false',
+                }))
     except Exception as e:
         logging.error(f"Error while processing query parameters: {e}")
-    return param_string_mid
+    return ''.join(param_string_mid)
 
-def postman_param(value):
-    return "${"+value.strip('}').strip('{')+"}"
+def build_variable_index(*variable_lists):
+    """
+    Precomputes the Postman variable name -> JMeter reference map used by substitute_variables.
+    """
+    index = dict(DYNAMIC_VARIABLES)
+    for variables in variable_lists:
+        index.update((var['key'], f"${{{var['key']}}}") for var in variables or [] if var.get('key'))
+    return index
+
+def substitute_variables(text, index, unresolved=None):
+    """
+    Rewrites every Postman {{name}} reference into its JMeter form in a single pass.
+    Names missing from the index become ${name} and are recorded in unresolved.
+    """
+    def resolve(match):
+        name = match.group(1).strip()
+        reference = index.get(name)
+        if reference is None:
+            if unresolved is not None:
+                unresolved.add(name)
+            reference = f"${{{name}}}"
+        return reference
+    return POSTMAN_VARIABLE.sub(resolve, text)
+
+def add_extractors(extractors):
+    """
+    Generates JSON/regex extractor elements for a list of (variable, kind, expression).
+    """
+    extractor_string = []
+    for variable, kind, expression in extractors or []:
+        if kind == 'header':
+            expression = f"(?i){re.escape(expression)}:\\s*([^\\r\\n]+)"
+        extractor_string.append(render_template(regex_extractor_compiled if kind == 'header' else json_extractor_compiled, {
+            'MY-VAR-NAME': xml_escape(variable),
+            'MY-EXPRESSION': xml_escape(expression),
+        }))
+    return ''.join(extractor_string)
 
-def process_request(request, num, TG_TC_HTTPSampler_jmx, raw_body_part, without_body_part, headerStringStart_jmx, headerStringEnd_jmx):
+def process_request(request, num, extractors=None):
     """
     Processes a single request dictionary to generate the corresponding JMX snippet.
     """
     try:
-        temp_jmx = TG_TC_HTTPSampler_jmx
         my_name = request['name']
-        
-        #print(request['request']['url']['protocol'])
-
-        my_name_updated = f"{num}_{my_name}"
+        url = request['request']['url']
+        values = {
+            'MY-NAME': xml_escape(f"{num}_{my_name}"),
+            'MY-METHOD': xml_escape(request['request']['method']),
+        }
 
-        # Creatinf Request
-        temp_jmx = temp_jmx.replace('MY-NAME', my_name_updated)
+        protocol = url.get('protocol', '')
+        values['MY-PROTOCOL'] = xml_escape(protocol)
 
-        if "{{" in request['request']['url']['protocol']:
-            protocol = postman_param(request['request']['url']['protocol'])
-            temp_jmx = temp_jmx.replace('MY-PROTOCOL',protocol)
-        else:
-            temp_jmx = temp_jmx.replace('MY-PROTOCOL',request['request']['url']['protocol'])
-
-        if "{{" in request['request']['url']['host'][0]:
-            host = postman_param(request['request']['url']['host'][0])
-            temp_jmx = temp_jmx.replace('MY-DOMAIN',host)
-        else:
-            temp_jmx = temp_jmx.replace('MY-DOMAIN',{request['request']['url']['host'][0]})
-        
-        if "{{" in request['request']['url']['port']:
-            port = postman_param(request['request']['url']['port'])
-            temp_jmx = temp_jmx.replace('MY-PORT',port)
-        else:
-            temp_jmx = temp_jmx.replace('MY-PORT',request['request']['url']['port'])
-
-        temp_jmx = temp_jmx.replace('MY-METHOD', request['request']['method'])
-
-        try :
-            if request['request']['url']['query']:
-                url_param = ''
-                for i in request['request']['url']['query']:
-                    element = f"""
-                                    <elementProp name="HTTPsampler.Arguments" elementType="Arguments" guiclass="HTTPArgumentsPanel" testclass="Arguments" testname="User Defined Variables">
-                                        <collectionProp name="Arguments.arguments">
-                                        <elementProp name="{i['key']}" elementType="HTTPArgument">
-                                            <boolProp name="HTTPArgument.always_encode">false</boolProp>
-                                            <stringProp name="Argument.value">{i['value']}</stringProp>
-                                            <stringProp name="Argument.metadata">=</stringProp>
-                                            <boolProp name="HTTPArgument.use_equals">true</boolProp>
-                                            <stringProp name="Argument.name">n</stringProp>
-                                        </elementProp>
-                                        </collectionProp>
-                                    </elementProp>
-                                """
-                    url_param += element
-                temp_jmx = temp_jmx.replace('MY-URL-PARAM',url_param)
-                    
-        except KeyError:
-            temp_jmx = temp_jmx.replace('MY-URL-PARAM','')
+        # Postman v2.1 allows the host as a list of labels or as one string
+        host = url.get('host', [])
+        host = host if isinstance(host, str) else '.'.join(host)
+        values['MY-DOMAIN'] = xml_escape(host)
 
+        port = url.get('port', '')
+        values['MY-PORT'] = xml_escape(port)
 
         # Replace URL
-        path = request['request']['url']['path']
-        #print('/'.join(path))
-        my_url = re.sub('&', '&amp;', '/'.join(path))
-        temp_jmx = temp_jmx.replace('MY-PATH', my_url)
+        path = url.get('path', [])
+        if isinstance(path, str):
+            path = [path]
+        my_url = '/' + '/'.join(path).lstrip('/') if path else ''
+        query_params = url.get('query', [])
 
         # Handle body
-        my_request_body = ""
-        try:
-            body = request['request']['body']
-            body_mode = body['mode']
-            if body_mode == 'raw':
-                my_request_body = re.sub(r'&', '&amp;', body['raw'].replace('\n', ''))
-                my_request_body = re.sub('<', '&lt;', my_request_body)
-                my_request_body = re.sub('>', '&gt;', my_request_body)
-                body_part = raw_body_part.replace('MY-BODY', my_request_body)
-                temp_jmx = temp_jmx.replace('DYNAMIC-BODY-PART', body_part)
-            elif body_mode in ['urlencoded', 'formdata']:
-                for param in body[body_mode]:
-                    if not param.get('disabled', False):
-                        param_to_add = (
-                            f'<elementProp name="{param["key"]}" elementType="HTTPArgument">'
-                            ' <boolProp name="HTTPArgument.always_encode">true</boolProp>'
-                            f' <stringProp name="Argument.value">{param["value"]}</stringProp>'
-                            ' <stringProp name="Argument.metadata">=</stringProp>'
-                            ' <boolProp name="HTTPArgument.use_equals">true</boolProp>'
-                            f' <stringProp name="Argument.name">{param["key"]}</stringProp>'
-                            ' </elementProp>'
-                        )
-                        my_request_body += param_to_add
-                param_string_all = f'<collectionProp name="Arguments.arguments">{my_request_body}</collectionProp>'
-                temp_jmx = temp_jmx.replace('DYNAMIC-BODY-PART', without_body_part.replace('<collectionProp name="Arguments.arguments"/>           </elementProp>', param_string_all))
-        except KeyError:
-            # If body doesn't exist, handle query parameters
-            if 'query' in request['request']['url']:
-                query_params = request['request']['url']['query']
-                param_string_mid = add_query_params(query_params)
-                param_string_all = f'<collectionProp name="Arguments.arguments">{param_string_mid}</collectionProp>'
-                temp_jmx = temp_jmx.replace('DYNAMIC-BODY-PART', without_body_part.replace('<collectionProp name="Arguments.arguments"/>           </elementProp>', param_string_all))
-            else:
-                temp_jmx = temp_jmx.replace('DYNAMIC-BODY-PART', without_body_part)
+        body = request['request'].get('body') or {}
+        body_mode = body.get('mode')
+        if body_mode == 'raw':
+            # A raw body owns HTTPsampler.Arguments, so query parameters stay on the path
+            enabled_query = [p for p in query_params if not p.get('disabled', False)]
+            if enabled_query:
+                my_url += '?' + '&'.join(f"{p['key']}={p.get('value') or ''}" for p in enabled_query)
+            values['DYNAMIC-BODY-PART'] = render_template(raw_body_compiled, {
+                'MY-BODY': xml_escape(body.get('raw', '').replace('\n', '')),
+            })
+        elif body_mode in ['urlencoded', 'formdata']:
+            arguments = add_query_params(query_params) + add_query_params(body.get(body_mode, []))
+            values['DYNAMIC-BODY-PART'] = render_template(without_body_compiled, {'MY-ARGUMENTS': arguments})
+        else:
+            values['DYNAMIC-BODY-PART'] = render_template(without_body_compiled, {
+                'MY-ARGUMENTS': add_query_params(query_params, always_encode=False),
+            })
+        values['MY-PATH'] = xml_escape(my_url)
 
         # Add headers
         header_string_mid = add_headers(request['request'].get('header', []))
-        header_jmx = headerStringStart_jmx + header_string_mid + headerStringEnd_jmx
-        temp_jmx += header_jmx
 
-        return temp_jmx
+        return ''.join((
+            render_template(sampler_compiled, values),
+            headerStringStart_jmx, header_string_mid, headerStringEnd_jmx,
+            add_extractors(extractors), close_hash_tree_jmx,
+        ))
     except Exception as e:
         logging.error(f"Error while processing request: {e}")
         return ""
 
-def process_level(level, TG_TC_HTTPSampler_jmx, raw_body_part, without_body_part, headerStringStart_jmx, headerStringEnd_jmx):
+def process_level(level):
     """
-    Recursively processes a level (folder or requests) to handle nested structures.
+    Recursively walks a level (folder or requests) of an in-memory collection, yielding the
+    same (event, item) pairs as postman_stream.iter_collection.
     """
-    itr_final_jmx = ""
-    for num, item in enumerate(level, start=1):
+    for item in level:
         if 'item' in item:  # Folder structure
-            logging.info(f"Processing folder: {item['name']}")
-            itr_final_jmx += process_level(item['item'], TG_TC_HTTPSampler_jmx, raw_body_part, without_body_part, headerStringStart_jmx, headerStringEnd_jmx)
+            yield 'folder_start', item
+            yield from process_level(item['item'])
+            yield 'folder_end', item
         else:  # Single request
-            itr_final_jmx += process_request(item, num, TG_TC_HTTPSampler_jmx, raw_body_part, without_body_part, headerStringStart_jmx, headerStringEnd_jmx)
-    return itr_final_jmx
+            yield 'request', item
 
-def process_variables_file(filepath, description, output):
+class SamplerWriter:
     """
-    Process a variable file (environment or global) and replace placeholders in the output.
+    Renders JMX from a stream of collection events, passing each piece to write as soon as it
+    is produced. Folders become Transaction Controllers and, with thread_group_per_folder,
+    every top-level folder gets its own Thread Group sized by its workload weight.
+    Collection variables seen in the stream are appended to variables.
+    """
+
+    def __init__(self, write, index, variables, unresolved=None, options=None, correlations=None):
+        self.write = write
+        self.index = index
+        self.variables = variables
+        self.unresolved = unresolved
+        self.options = options or {}
+        self.extractors, self.substitutions = correlations or ({}, {})
+        self.requests = 0
+        self.counters = [0]
+        self.group_open = False
+        self.weight_total = 0
+        self.deferred = []
+        self.loose = None
+
+    def group_settings(self, name):
+        return (self.options.get('workload') or {}).get(name) or {}
+
+    def open_group(self, name):
+        settings = self.group_settings(name)
+        if self.options.get('thread_group_per_folder') and settings.get('tps') and settings.get('response_time'):
+            # Size the group for its own throughput target by Little's law
+            profile = self.options.get('load_profile') or {}
+            threads = str(littles_law_threads(settings['tps'], settings['response_time'], profile.get('think_time', 0), profile.get('headroom', 1.2)))
+        elif self.options.get('thread_group_per_folder'):
+            weight = settings.get('weight', 1)
+            self.weight_total += weight
+            threads = render_template(weighted_threads_compiled, {'MY-WEIGHT': str(weight)})
+        else:
+            threads = '${THREADS}'
+        self.write(render_template(thread_group_compiled, {'MY-TG-NAME': xml_escape(name), 'MY-TG-THREADS': threads}))
+
+        tps = self.group_settings(name).get('tps')
+        if tps and self.options.get('thread_group_per_folder'):
+            # Constant Throughput Timer works in samples per minute
+            self.write(render_template(constant_throughput_timer_compiled, {
+                'MY-TG-NAME': xml_escape(name),
+                'MY-TG-THROUGHPUT': f"{float(tps) * 60:.1f}",
+            }))
+        self.group_open = True
+
+    def close_group(self):
+        if self.group_open:
+            self.write(close_hash_tree_jmx)
+            self.group_open = False
+
+    def prepare_top_level(self, folder):
+        """
+        Open or close the enclosing Thread Group before a top-level item is written. With
+        thread_group_per_folder, loose top-level requests are spooled and written on close,
+        all in one default Thread Group.
+        """
+        if self.options.get('thread_group_per_folder'):
+            if folder:
+                self.close_group()
+            elif self.loose is None:
+                self.loose = tempfile.TemporaryFile('w+')
+        elif not self.group_open:
+            self.open_group(DEFAULT_THREAD_GROUP)
+
+    def open_folder(self, item):
+        logging.info(f"Processing folder: {item.get('name', '')}")
+        if len(self.counters) == 2 and self.options.get('thread_group_per_folder'):
+            self.open_group(item.get('name', ''))
+        if self.options.get('transaction_controllers'):
+            self.write(render_template(transaction_controller_compiled, {'MY-TC-NAME': xml_escape(item.get('name', ''))}))
+
+    def feed(self, events):
+        for event, item in events:
+            if event == 'folder_start':
+                if len(self.counters) == 1:
+                    self.prepare_top_level(True)
+                self.counters[-1] += 1
+                self.counters.append(0)
+                if 'name' in item:
+                    self.open_folder(item)
+                else:
+                    # A streamed folder may name itself after its items: spool them until then
+                    spool = tempfile.TemporaryFile('w+')
+                    self.deferred.append((item, self.write, spool))
+                    self.write = spool.write
+            elif event == 'folder_end':
+                if self.deferred and self.deferred[-1][0] is item:
+                    _, self.write, spool = self.deferred.pop()
+                    self.open_folder(item)
+                    spool.seek(0)
+                    for chunk in iter(lambda: spool.read(1 << 20), ''):
+                        self.write(chunk)
+                    spool.close()
+                self.counters.pop()
+                if self.options.get('transaction_controllers'):
+                    self.write(close_hash_tree_jmx)
+                if len(self.counters) == 1 and self.options.get('thread_group_per_folder'):
+                    self.close_group()
+            elif event == 'request':
+                write = self.write
+                if len(self.counters) == 1:
+                    self.prepare_top_level(False)
+                    if self.loose is not None:
+                        write = self.loose.write
+                self.counters[-1] += 1
+                self.requests += 1
+                sampler = process_request(item, self.counters[-1], self.extractors.get(self.requests))
+                # Thread Group of the request, numbered like plan_correlations numbers them
+                group = self.counters[0] if self.options.get('thread_group_per_folder') and len(self.counters) > 1 else None
+                sampler = substitute_values(sampler, self.requests, self.substitutions, group)
+                write(substitute_variables(sampler, self.index, self.unresolved))
+            elif event == 'variable':
+                self.variables.extend(item or [])
+                self.index.update(build_variable_index(item))
+
+    def close(self):
+        self.close_group()
+        if self.loose is not None:
+            self.open_group(DEFAULT_THREAD_GROUP)
+            self.loose.seek(0)
+            for chunk in iter(lambda: self.loose.read(1 << 20), ''):
+                self.write(chunk)
+            self.loose.close()
+            self.loose = None
+            self.close_group()
+
+def file_digest(filepath, digest):
+    with open(filepath, 'rb') as rf:
+        for chunk in iter(lambda: rf.read(1 << 20), b''):
+            digest.update(chunk)
+
+def converter_fingerprint(options=None):
+    """
+    Hash of the converter sources (templates included) and options, so cached output is
+    invalidated whenever the generated JMX could change.
+    """
+    digest = hashlib.sha256(json.dumps(options or {}, sort_keys=True, default=str).encode())
+    for source in (__file__, postman_stream.__file__, correlation.__file__):
+        file_digest(source, digest)
+    return digest.hexdigest()
+
+def conversion_cache_key(fingerprint, inputfile, variablefile, globalvariablefile):
+    """
+    Cache key over the converter, the collection and its environment/globals exports.
+    """
+    digest = hashlib.sha256(fingerprint.encode())
+    for filepath in (inputfile, variablefile, globalvariablefile):
+        digest.update(b'\0')
+        if filepath:
+            file_digest(filepath, digest)
+    return digest.hexdigest()
+
+def write_atomic(path, content):
+    """
+    Write a cache entry through a temporary file so readers never see a partial entry.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), suffix='.partial', delete=False) as wf:
+        wf.write(content)
+    os.replace(wf.name, path)
+
+def write_cached_level(level, writer, cache_dir, fingerprint):
+    """
+    Same as SamplerWriter.feed over the top level of an in-memory collection, but reuses the
+    rendered subtree of every top-level folder whose content and position are unchanged.
+    """
+    for num, item in enumerate(level, start=1):
+        if 'item' not in item:
+            writer.feed(process_level([item]))
+            continue
+
+        writer.prepare_top_level(True)
+        digest = hashlib.sha256(f"{fingerprint}\0{num}\0".encode())
+        digest.update(json.dumps(item, sort_keys=True).encode())
+        fragment_path = os.path.join(cache_dir, 'fragments', digest.hexdigest() + '.json')
+        try:
+            with open(fragment_path, 'r') as rf:
+                fragment = json.load(rf)
+            os.utime(fragment_path)
+            logging.info(f"Reusing cached folder: {item.get('name', '')}")
+            writer.counters[-1] += 1
+        except (OSError, ValueError):
+            rendered, names = [], set()
+            write, unresolved, weight_total, requests = writer.write, writer.unresolved, writer.weight_total, writer.requests
+            writer.write, writer.unresolved = rendered.append, names
+            writer.feed(process_level([item]))
+            writer.write, writer.unresolved = write, unresolved
+            fragment = {
+                'jmx': ''.join(rendered), 'unresolved': sorted(names),
+                'weight': writer.weight_total - weight_total, 'requests': writer.requests - requests,
+            }
+            write_atomic(fragment_path, json.dumps(fragment))
+            writer.weight_total, writer.requests = weight_total, requests
+        writer.write(fragment['jmx'])
+        writer.weight_total += fragment['weight']
+        writer.requests += fragment['requests']
+        if writer.unresolved is not None:
+            writer.unresolved.update(fragment['unresolved'])
+
+def build_user_defined_variables(variables, description):
+    """
+    Generates JMX user defined variable elements for a list of Postman key/value variables.
+    """
+    udv = []
+    for var in variables or []:
+        key = var.get('key', '')
+        if key and not var.get('disabled', False):
+            udv.append(render_template(user_defined_variable_compiled, {
+                'MY-VAR-NAME': xml_escape(key),
+                'MY-VAR-VALUE': xml_escape(var.get('value', '')),
+                'MY-VAR-DESC': xml_escape(description),
+            }))
+    return ''.join(udv)
+
+def process_variables_file(filepath):
+    """
+    Load the variables of a Postman environment or globals export.
     """
     try:
         with open(filepath, 'r') as rf:
-            file_content = rf.read()
-            json_file = json.loads(file_content)
-            variables = json_file.get('values', [])
-            
-            current_udv = re.search(r'<collectionProp name="Arguments.arguments">(.*?)</collectionProp>', output)
-            if not current_udv:
-                logging.warning(f"Could not find user-defined variables in the template.")
-                return output
-
-            imported_udv = ""
-            for var in variables:
-                key = var.get('key', '')
-                value = var.get('value', '')
-                if key:
-                    # Add to user-defined variables
-                    element = (
-                        f'<elementProp name="{key}" elementType="Argument">'
-                        f'<stringProp name="Argument.name">{key}</stringProp>'
-                        f'<stringProp name="Argument.value">{value}</stringProp>'
-                        f'<stringProp name="Argument.metadata">=</stringProp>'
-                        f'<stringProp name="Argument.desc">{description}</stringProp>'
-                        f'</elementProp>'
-                    )
-                    imported_udv += element
-
-                    # Replace placeholders in the output
-                    output = output.replace(f"{{{{{key}}}}}", f"${{{key}}}")
-
-            final_udv = current_udv.group(1) + imported_udv
-            output = output.replace(current_udv.group(1), final_udv)
-
+            return json.load(rf).get('values', [])
     except Exception as e:
-        logging.info(f'Error processing "{description}" file: {str(e)}')
-
-    return output
-
-def process_variable(value, output):
-    postman_userdefined_values =''
-    for i in value:
-        element = (
-            f'<elementProp name="{i['key']}" elementType="Argument">'
-            f'<stringProp name="Argument.name">{i['key']}</stringProp>'
-            f'<stringProp name="Argument.value">{i['value']}</stringProp>'
-            f'<stringProp name="Argument.metadata">=</stringProp>'
-            f'<stringProp name="Argument.desc">POSTMAN Variable</stringProp>'
-            f'</elementProp>'
-        )
-        postman_userdefined_values += element
-    return output.replace('MY-POSTMAN-VARIABLE',postman_userdefined_values)
-
-def main(inputpath):
-    #inputpath = input("Enter full directory path where Postman collection is parked along with environment and/or global variables: ")
-    #inputpath = 'Postman Collection'
-    global variablefile, globalvariablefile
+        logging.info(f'Error processing variables file "{filepath}": {str(e)}')
+        return []
 
-    try:
-        # Identify input files
-        inputfile = None
-        for filename in os.listdir(inputpath):
-            filepath = os.path.join(inputpath, filename)
-            if "collection" in filename:
-                inputfile = filepath
-            elif "environment" in filename:
-                variablefile = filepath
-            elif "globals" in filename:
-                globalvariablefile = filepath
-
-        if not inputfile:
-            raise FileNotFoundError("Postman collection file not found in the specified directory.")
+def prune_cache(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    """
+    Delete the least recently used cached JMX files and folder fragments (hits refresh their
+    modification time) until the cache is at most max_bytes.
+    """
+    entries = []
+    for directory in (cache_dir, os.path.join(cache_dir, 'fragments')):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Skip the fragments directory and files other processes are still writing
+            if os.path.isfile(path) and not name.endswith('.partial'):
+                entries.append((stat.st_mtime, stat.st_size, path))
+    size = sum(entry[1] for entry in entries)
+    for _, entry_size, path in sorted(entries):
+        if size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # Already removed by a concurrent batch worker
+            pass
+        size -= entry_size
+
+def convert_collection(inputfile, outfile, variablefile=None, globalvariablefile=None, stream=False, cache_dir=None, options=None):
+    """
+    Convert a single Postman collection (plus optional environment/globals exports) into a JMX file.
+    With stream=True the collection is parsed incrementally and samplers are spooled to disk
+    as they are produced, so memory stays bounded regardless of the collection size.
+    With cache_dir, unchanged inputs reuse the previous JMX and unchanged top-level folders
+    reuse their previously rendered samplers. options come from load_options.
+    """
+    if cache_dir:
+        fingerprint = converter_fingerprint(options)
+        cached_jmx = os.path.join(cache_dir, conversion_cache_key(fingerprint, inputfile, variablefile, globalvariablefile) + '.jmx')
+        if os.path.isfile(cached_jmx):
+            shutil.copyfile(cached_jmx, outfile)
+            os.utime(cached_jmx)
+            write_load_properties(outfile, options)
+            logging.info(f"Inputs unchanged, reused cached JMX: {cached_jmx}")
+            return outfile
+
+    global_values = process_variables_file(globalvariablefile) if globalvariablefile else []
+    environment_values = process_variables_file(variablefile) if variablefile else []
+    index = build_variable_index(global_values, environment_values)
+    bound = set(csv_variables(options))
+    index.update((name, f"${{{name}}}") for name in bound)
+    variable = []
+    unresolved = set()
+
+    with tempfile.TemporaryFile('w+', dir=os.path.dirname(os.path.abspath(outfile))) as spool:
+        correlate = (options or {}).get('correlation')
+        if stream:
+            # Correlation needs a first pass that reads the example responses
+            correlations = plan_correlations(iter_collection(inputfile, skip_keys=()), (options or {}).get('thread_group_per_folder')) if correlate else None
+            writer = SamplerWriter(spool.write, index, variable, unresolved, options, correlations)
+            writer.feed(iter_collection(inputfile))
+        else:
+            with open(inputfile, 'r') as rf:
+                collection = json.load(rf)
+            correlations = plan_correlations(process_level(collection.get('item', [])), (options or {}).get('thread_group_per_folder')) if correlate else None
+            writer = SamplerWriter(spool.write, index, variable, unresolved, options, correlations)
+            writer.feed([('variable', collection.get('variable'))])
+            # Correlated values cross folder boundaries, so folder fragments are not reusable
+            if cache_dir and not correlate:
+                write_cached_level(collection.get('item', []), writer, cache_dir, fingerprint)
+            else:
+                writer.feed(process_level(collection.get('item', [])))
+        writer.close()
+
+        # Later User Defined Variables override earlier ones, matching Postman scope precedence
+        # Variables bound to the CSV Data Set are left out so every thread reads its own row
+        udv = ''.join((
+            build_user_defined_variables([var for var in global_values if var.get('key') not in bound], "Imported from global variables"),
+            build_user_defined_variables([var for var in variable if var.get('key') not in bound], "POSTMAN Variable"),
+            build_user_defined_variables([var for var in environment_values if var.get('key') not in bound], "Imported from environment variables"),
+        ))
+        if writer.weight_total:
+            udv += build_user_defined_variables(
+                [{'key': 'WORKLOAD_WEIGHT_TOTAL', 'value': str(writer.weight_total)}],
+                "Sum of thread group weights - each group gets THREADS * weight / total",
+            )
+        udv = substitute_variables(udv, index, unresolved)
+
+        # Collection variables may only arrive after the items when streaming
+        unresolved.difference_update(index)
+        unresolved.difference_update(variable for extractors in writer.extractors.values() for variable, _, _ in extractors)
+        if unresolved:
+            logging.warning(f"Variables used but not defined in any variable scope: {', '.join(sorted(unresolved))}")
+
+        spool.seek(0)
+        with open(outfile, 'w') as wf:
+            wf.write(render_plan_head(build_plan(options), udv))
+            shutil.copyfileobj(spool, wf)
+            wf.write(baseline_tail_jmx)
+
+    write_load_properties(outfile, options)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        partial = f"{cached_jmx}.{os.getpid()}.partial"
+        shutil.copyfile(outfile, partial)
+        os.replace(partial, cached_jmx)
+        prune_cache(cache_dir)
+    return outfile
+
+def java_hash(value):
+    """
+    Java String.hashCode, which JMeter uses to name the load_profile collection properties.
+    """
+    h = 0
+    for char in value:
+        h = (31 * h + ord(char)) & 0xFFFFFFFF
+    return h - (1 << 32) if h >= 1 << 31 else h
+
+def format_number(value):
+    """
+    Render whole floats without a trailing .0 (JMeter fields read better as 5 than 5.0).
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def littles_law_threads(tps, response_time, think_time=0, headroom=1.0):
+    """
+    Concurrency needed to sustain tps by Little's law, N = X * (R + Z), padded by headroom.
+    """
+    return max(1, math.ceil(float(tps) * (float(response_time) + float(think_time)) * float(headroom)))
+
+def profile_rows(profile):
+    """
+    Expand a load_profile section into Throughput Shaping Timer rows of (start_tps, end_tps, seconds).
+    """
+    kind = profile.get('type', 'soak')
+    ramp_up = int(profile.get('ramp_up', 60))
+    rows = []
+
+    def ramp_to(level, seconds):
+        previous = rows[-1][1] if rows else 0
+        if seconds > 0 and previous != level:
+            rows.append((previous, level, seconds))
+
+    if kind == 'soak':
+        ramp_to(profile['tps'], ramp_up)
+        rows.append((profile['tps'], profile['tps'], int(profile['duration'])))
+    elif kind == 'step':
+        start, end, steps = profile['start_tps'], profile['end_tps'], int(profile.get('steps', 5))
+        for step in range(steps):
+            level = round(start + (end - start) * step / max(steps - 1, 1), 2)
+            ramp_to(level, ramp_up if step == 0 else int(profile.get('step_ramp', 0)))
+            rows.append((level, level, int(profile['step_duration'])))
+    elif kind == 'spike':
+        base, spike = profile['base_tps'], profile['spike_tps']
+        spike_ramp = int(profile.get('spike_ramp', 1))
+        ramp_to(base, ramp_up)
+        for _ in range(int(profile.get('spikes', 1))):
+            rows.append((base, base, int(profile['base_duration'])))
+            rows.append((base, spike, spike_ramp))
+            rows.append((spike, spike, int(profile['spike_duration'])))
+            rows.append((spike, base, spike_ramp))
+        rows.append((base, base, int(profile['base_duration'])))
+    elif kind == 'capacity':
+        start, step_tps = profile['start_tps'], profile['step_tps']
+        for step in range(int(profile.get('steps', 5))):
+            level = start + step_tps * step
+            ramp_to(level, ramp_up if step == 0 else int(profile.get('step_ramp', 0)))
+            rows.append((level, level, int(profile['step_duration'])))
+    else:
+        raise ValueError(f"Unknown load_profile type '{kind}' (expected soak, step, spike or capacity)")
+    return rows
+
+def csv_variables(options):
+    """
+    Variables bound to the CSV Data Set, in file order: the generator columns (test_data_gen.py
+    writes all of them, in this order), or csv_data.variables for a CSV made some other way.
+    """
+    csv_data = (options or {}).get('csv_data') or {}
+    return list(csv_data.get('columns') or csv_data.get('variables') or [])
+
+def build_plan(options):
+    """
+    Threads, duration and timer rows for the plan head, derived from the configured
+    load_profile or falling back to DEFAULT_PLAN.
+    """
+    options = options or {}
+    profile = options.get('load_profile')
+    if not profile:
+        plan = dict(DEFAULT_PLAN)
+    else:
+        rows = profile_rows(profile)
+        peak = max(max(start, end) for start, end, _ in rows)
+        threads = littles_law_threads(peak, profile.get('response_time', 1), profile.get('think_time', 0), profile.get('headroom', 1.2))
+        plan = {
+            'MY-THREADS': str(threads),
+            'MY-RAMPUP-TIME': str(int(profile.get('ramp_up', 60))),
+            'MY-START-TPS': format_number(rows[0][0]),
+            'MY-END-TPS': format_number(peak),
+            'MY-TEST-DURATION': str(sum(duration for _, _, duration in rows)),
+            'MY-PROFILE-NAME': xml_escape(f"{profile.get('type', 'soak').upper()} TEST (generated)"),
+            'rows': rows,
+        }
 
-        # Load Postman collection
-        with open(inputfile, 'r') as rf:
-            file_content = rf.read()
-            collection = json.loads(file_content)
-            level_1 = collection.get('item', [])
-            variable = collection.get('variable')
+    plan['load_mode'] = options.get('load_mode', False)
+    if csv_variables(options):
+        csv_data = options['csv_data']
+        plan['MY-CSV-DATA-SET'] = render_template(csv_data_set_compiled, {
+            'MY-CSV-FILE': xml_escape(csv_data.get('file', 'test_data.csv')),
+            'MY-CSV-VARIABLES': xml_escape(','.join(csv_variables(options))),
+            'MY-CSV-DELIMITER': xml_escape(csv_data.get('delimiter', ',')),
+            # Every thread gets its own row, so no two virtual users send the same data
+            'MY-CSV-SHARE-MODE': xml_escape(csv_data.get('share_mode', 'all')),
+        })
+    return plan
+
+def render_plan_head(plan, udv):
+    """
+    Render the baseline head with the plan variables, timer rows and user defined variables.
+    """
+    rendered_rows = []
+    for start, end, duration in plan['rows']:
+        start, end, duration = format_number(start), format_number(end), format_number(duration)
+        rendered_rows.append(render_template(load_profile_row_compiled, {
+            'MY-ROW-ID': str(java_hash(start + end + duration)),
+            'MY-ROW-START-ID': str(java_hash(start)), 'MY-ROW-START': start,
+            'MY-ROW-END-ID': str(java_hash(end)), 'MY-ROW-END': end,
+            'MY-ROW-DURATION-ID': str(java_hash(duration)), 'MY-ROW-DURATION': duration,
+        }))
+    values = {key: value for key, value in plan.items() if key.startswith('MY-')}
+    values['MY-LOAD-PROFILE'] = ''.join(rendered_rows)
+    values['MY-LISTENERS'] = '' if plan.get('load_mode') else gui_listeners_jmx
+    values['MY-POSTMAN-VARIABLE'] = udv
+    return render_template(baseline_head_compiled, values)
+
+def load_properties_path(outfile):
+    return os.path.splitext(outfile)[0] + '.properties'
+
+def write_load_properties(outfile, options):
+    """
+    In load mode, write the lean result-saving properties next to the JMX; otherwise remove
+    a stale file from an earlier load-mode run.
+    """
+    properties = load_properties_path(outfile)
+    if (options or {}).get('load_mode'):
+        with open(properties, 'w') as wf:
+            wf.write(load_mode_properties)
+        logging.info(f"Load mode: run with -q {properties} to keep result saving lean")
+    elif os.path.isfile(properties):
+        os.remove(properties)
+
+def load_options(config_path):
+    """
+    Read converter options from the tests.postman section of configfile.yml.
+    """
+    with open(config_path, 'r') as rf:
+        config = yaml.safe_load(rf) or {}
+    postman = (config.get('tests') or {}).get('postman') or {}
+    options = {key: postman[key] for key in OPTION_KEYS if key in postman}
+    load_profile = ((config.get('tests') or {}).get('jmeter') or {}).get('load_profile')
+    if load_profile:
+        options['load_profile'] = load_profile
+    return options
+
+def input_prefix(filename, marker):
+    """
+    Name shared by a collection and its variable files, e.g. 'Wordsmith' for
+    Wordsmith.postman_collection.json and Wordsmith.postman_environment.json.
+    """
+    return filename.split(marker)[0].replace('.postman_', '').replace('postman_', '').rstrip('._- ')
+
+def match_variable_file(collection_prefix, candidates):
+    """
+    Pick the environment/globals file for a collection: the one sharing its name prefix,
+    otherwise the only candidate in the folder.
+    """
+    for prefix, filepath in candidates:
+        if prefix and prefix == collection_prefix:
+            return filepath
+    return candidates[0][1] if len(candidates) == 1 else None
+
+def discover_inputs(inputpath):
+    """
+    Find every Postman collection in a folder together with its matching environment and
+    globals exports. Returns a list of (collection, environment, globals) paths.
+    """
+    collections, environments, globals_files = [], [], []
+    for filename in sorted(os.listdir(inputpath)):
+        filepath = os.path.join(inputpath, filename)
+        if not filename.endswith('.json') or not os.path.isfile(filepath):
+            continue
+        if "collection" in filename:
+            collections.append((input_prefix(filename, 'collection'), filepath))
+        elif "environment" in filename:
+            environments.append((input_prefix(filename, 'environment'), filepath))
+        elif "globals" in filename:
+            globals_files.append((input_prefix(filename, 'globals'), filepath))
+
+    return [
+        (filepath, match_variable_file(prefix, environments), match_variable_file(prefix, globals_files))
+        for prefix, filepath in collections
+    ]
+
+def output_path(inputfile):
+    """
+    JMX next to the collection, named after it without the export suffix, so
+    api.v1.postman_collection.json becomes api.v1.jmx.
+    """
+    name = os.path.basename(inputfile)
+    for suffix in COLLECTION_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return os.path.join(os.path.dirname(inputfile), name + '.jmx')
+
+def convert_job(job):
+    """
+    Process pool entry point: converts one collection and reports (outfile, seconds, error).
+    """
+    inputfile, variablefile, globalvariablefile, stream, cache_dir, options = job
+    started = time.perf_counter()
+    try:
+        outfile = convert_collection(inputfile, output_path(inputfile), variablefile, globalvariablefile, stream, cache_dir, options)
+        return outfile, time.perf_counter() - started, None
     except Exception as e:
-        logging.error(f"Error opening input files: {e}")
-        sys.exit(1)
+        return None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+def convert_batch(inputpath, stream=False, workers=None, cache_dir=None, options=None):
+    """
+    Convert every collection in the folder concurrently across CPU cores and log a
+    per-file timing/failure summary. Returns the number of failed conversions.
+    """
+    jobs = [(inputfile, variablefile, globalvariablefile, stream, cache_dir, options) for inputfile, variablefile, globalvariablefile in discover_inputs(inputpath)]
+    if not jobs:
+        raise FileNotFoundError("Postman collection file not found in the specified directory.")
+    # Two workers writing one JMX would leave whichever finished last
+    targets = {}
+    for job in jobs:
+        targets.setdefault(output_path(job[0]), []).append(os.path.basename(job[0]))
+    clashes = [f"{', '.join(names)} -> {os.path.basename(target)}" for target, names in targets.items() if len(names) > 1]
+    if clashes:
+        raise ValueError(f"Collections would be written to the same JMX: {'; '.join(clashes)}")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(convert_job, jobs))
+    elapsed = time.perf_counter() - started
+
+    failures = 0
+    logging.info("Batch conversion summary:")
+    for job, (outfile, seconds, error) in zip(jobs, results):
+        if error:
+            failures += 1
+            logging.error(f"  FAILED  {os.path.basename(job[0])} ({seconds:.2f}s): {error}")
+        else:
+            logging.info(f"  OK      {os.path.basename(job[0])} -> {outfile} ({seconds:.2f}s)")
+    logging.info(f"Converted {len(jobs) - failures}/{len(jobs)} collections in {elapsed:.2f}s")
+    return failures
 
-    # Main processing starts here
+def main(inputpath, stream=False, batch=False, workers=None, cache_dir=None, config=None, load_mode=False, correlate=False, csv_vars=None, csv_file='test_data.csv'):
+    #inputpath = input("Enter full directory path where Postman collection is parked along with environment and/or global variables: ")
+    #inputpath = 'Postman Collection'
     try:
-        itr_final_jmx = process_level(level_1, TG_TC_HTTPSampler_jmx, raw_body_part, without_body_part, headerStringStart_jmx, headerStringEnd_jmx)
-        #print(itr_final_jmx)
+        options = load_options(config) if config else {}
+        if load_mode:
+            options['load_mode'] = True
+        if correlate:
+            options['correlation'] = True
+        if csv_vars:
+            options['csv_data'] = {'file': csv_file, 'variables': [name.strip() for name in csv_vars.split(',') if name.strip()]}
     except Exception as e:
-        logging.error(f"Critical error during processing: {e}")
+        logging.error(f"Error reading configuration file: {e}")
         sys.exit(1)
 
-    # Update the baseline JMX
+    if batch:
+        try:
+            failures = convert_batch(inputpath, stream, workers, cache_dir, options)
+        except Exception as e:
+            logging.error(f"Error opening input files: {e}")
+            sys.exit(1)
+        if failures:
+            sys.exit(1)
+        return
+
     try:
-        #baseline_jmx_replace = BASELINE_JMX_TEMPLATE.format(hashTree='<hashTree>', itr_final_jmx=itr_final_jmx, baseline_suffix='</hashTree>   </hashTree> </jmeterTestPlan>')
-        output = baseline_jmx.replace("BASELINE_JMX_FIND", '</ThreadGroup>'+ '<hashTree>'+ itr_final_jmx + '</hashTree>'+ '</hashTree>   </hashTree> </jmeterTestPlan>')
-        #print(output)
+        # Identify input files
+        inputs = discover_inputs(inputpath)
+        if not inputs:
+            raise FileNotFoundError("Postman collection file not found in the specified directory.")
+        inputfile, variablefile, globalvariablefile = inputs[-1]
     except Exception as e:
-        logging.error(f"Error updating baseline JMX: {e}")
+        logging.error(f"Error opening input files: {e}")
         sys.exit(1)
-   
-    # Process environment variables
-    if variablefile:
-        output = process_variables_file(variablefile, "Imported from environment variables", output)
-
-    # Process global variables
-    if globalvariablefile:
-        output = process_variables_file(globalvariablefile, "Imported from global variables", output)
-    
-    if variable:
-        output = process_variable(variable, output)
-        print('output')
-    else:
-        output = output.replace('MY-POSTMAN-VARIABLE','')
 
     # Write final JMX to output file
     try:
-        outfile_name = os.path.basename(inputfile).split('.')[0] + '.jmx'
-        outfile = os.path.join(inputpath, outfile_name)
-        with open(outfile, 'w') as wf:
-            wf.write(output)
-            logging.info(f"Successfully created JMeter JMX file at: {outfile}")
+        outfile = output_path(inputfile)
+        convert_collection(inputfile, outfile, variablefile, globalvariablefile, stream, cache_dir, options)
+        logging.info(f"Successfully created JMeter JMX file at: {outfile}")
     except Exception as e:
-        logging.error(f"Error writing output file: {e}")
+        logging.error(f"Critical error during processing: {e}")
         sys.exit(1)
 
 if __name__ == '__main__':
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Convert Postman into Jmeter Script.")
     parser.add_argument("folder_path", help="Path to the postman folder")
+    parser.add_argument("--stream", action="store_true", help="Parse the collection incrementally to keep memory bounded for very large collections")
+    parser.add_argument("--batch", action="store_true", help="Convert every collection in the folder in parallel")
+    parser.add_argument("--workers", type=int, help="Number of worker processes for --batch (default: CPU count)")
+    parser.add_argument("--cache-dir", help=f"Reuse previous output when the collection, variable files and converter are unchanged (kept to {CACHE_MAX_BYTES >> 20} MiB, least recently used entries removed first)")
+    parser.add_argument("--load-mode", action="store_true", help="Generate a lean plan without GUI listeners for high-throughput non-GUI runs")
+    parser.add_argument("--correlate", action="store_true", help="Generate extractors for values set by test scripts or reused from example responses")
+    parser.add_argument("--csv-vars", help="Comma separated variables to bind to a CSV Data Set Config, in the CSV file's column order")
+    parser.add_argument("--csv-file", default="test_data.csv", help="CSV file read by the CSV Data Set Config (relative to the JMX)")
+    parser.add_argument("--config", help="configfile.yml with a tests.postman section (transaction controllers, thread groups, workload)")
     args = parser.parse_args()
-    main(args.folder_path)
+    main(args.folder_path, args.stream, args.batch, args.workers, args.cache_dir, args.config, args.load_mode, args.correlate, args.csv_vars, args.csv_file)
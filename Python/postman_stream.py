@@ -0,0 +1,190 @@
+import json
+import re
+
+########### Global Declarations #########
+
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRUCTURAL_CHAR = re.compile(r'["{}\[\]]')
+STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+decoder = json.JSONDecoder()
+
+
+########### Code  #########
+
+class JsonStreamReader:
+    """
+    Incremental reader over a JSON text file. Only the value currently being decoded is
+    held in memory; skipped values are scanned and discarded chunk by chunk.
+    """
+
+    def __init__(self, fileobj, chunk_size=CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self, size=None):
+        """
+        Drop consumed text and append the next chunk. Returns False at end of file.
+        """
+        if self.eof:
+            return False
+        chunk = self.fileobj.read(max(size or 0, self.chunk_size))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self):
+        """
+        Return the next non-whitespace character without consuming it ('' at end of file).
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read_more():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found}' in JSON stream")
+        self.pos += 1
+
+    def decode_value(self):
+        """
+        Decode and return the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+                # A number touching the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow geometrically so large values are not re-decoded quadratically
+            self._read_more(len(self.buf) - self.pos)
+
+    def skip_value(self):
+        """
+        Consume the next JSON value without materializing it.
+        """
+        if self.peek() not in '{["':
+            self.decode_value()
+            return
+        depth = 0
+        while True:
+            match = STRUCTURAL_CHAR.search(self.buf, self.pos)
+            if not match:
+                self.pos = len(self.buf)
+                if not self._read_more():
+                    raise ValueError("Unexpected end of JSON stream")
+                continue
+            char = match.group()
+            self.pos = match.end()
+            if char == '"':
+                self._skip_string()
+                if depth == 0:
+                    return
+            elif char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _skip_string(self):
+        while True:
+            self.pos = STRING_BODY.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) and self.buf[self.pos] == '"':
+                self.pos += 1
+                return
+            # Either the buffer ended mid-string or on a dangling escape character
+            if not self._read_more():
+                raise ValueError("Unterminated string in JSON stream")
+
+    def object_keys(self):
+        """
+        Iterate over the keys of the next JSON object. The caller must consume each value
+        (decode_value or skip_value) before advancing the iterator.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' but found '{separator}' in JSON stream")
+
+    def array_items(self):
+        """
+        Iterate over the elements of the next JSON array. The caller must consume each element.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' but found '{separator}' in JSON stream")
+
+def walk_items(reader, skip_keys):
+    for _ in reader.array_items():
+        yield from walk_item(reader, skip_keys)
+
+def walk_item(reader, skip_keys):
+    """
+    Streams one collection item. Folders are reported as they are entered and left so
+    nested requests never have to be held in memory together.
+    """
+    item = {}
+    is_folder = False
+    for key in reader.object_keys():
+        if key == 'item':
+            is_folder = True
+            yield 'folder_start', item
+            yield from walk_items(reader, skip_keys)
+        elif key in skip_keys:
+            reader.skip_value()
+        else:
+            item[key] = reader.decode_value()
+    yield ('folder_end' if is_folder else 'request'), item
+
+def iter_collection(filepath, skip_keys=('response',)):
+    """
+    Walks a Postman collection file incrementally and yields (event, value) pairs:
+    'folder_start'/'folder_end' and 'request' with the item dictionary, and 'info',
+    'variable', 'event' and 'auth' with the collection level values.
+    Keys listed in skip_keys (saved example responses by default) are never decoded.
+    """
+    with open(filepath, 'r') as rf:
+        reader = JsonStreamReader(rf)
+        for key in reader.object_keys():
+            if key == 'item':
+                yield from walk_items(reader, skip_keys)
+            elif key in ('info', 'variable', 'event', 'auth'):
+                yield key, reader.decode_value()
+            else:
+                reader.skip_value()
@@ -0,0 +1,184 @@
+import glob
+import math
+import os
+import psutil
+from host_metrics import CLOCK_TICKS, open_attribute, read_attribute
+
+########### Global Declarations #########
+
+# /proc/<pid>/stat fields after the command name: utime, stime and rss (pages)
+STAT_UTIME, STAT_STIME, STAT_RSS = 11, 12, 21
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+########### Code  #########
+
+def parse_target(spec):
+    """
+    'label=value' or just 'value' (then the value is the label too).
+    """
+    label, _, value = spec.partition("=")
+    return (label, value) if value else (spec, spec)
+
+class ProcessReader:
+    """
+    Cumulative CPU seconds, RSS bytes and disk read/write bytes of one process, from open
+    /proc/<pid>/stat and /proc/<pid>/io descriptors (psutil where there is no /proc).
+    read() returns None once the process is gone.
+    """
+
+    def __init__(self, pid, proc_root="/proc"):
+        self.pid = pid
+        self.stat = open_attribute(os.path.join(proc_root, str(pid), "stat"))
+        self.io = open_attribute(os.path.join(proc_root, str(pid), "io")) if self.stat is not None else None
+        self.process = psutil.Process(pid) if self.stat is None else None
+
+    def read(self):
+        try:
+            if self.stat is None:
+                with self.process.oneshot():
+                    times, memory = self.process.cpu_times(), self.process.memory_info()
+                    io = self.process.io_counters() if hasattr(self.process, "io_counters") else None
+                return (times.user + times.system, float(memory.rss),
+                        float(io.read_bytes) if io else float("nan"), float(io.write_bytes) if io else float("nan"))
+            fields = read_attribute(self.stat).rsplit(")", 1)[1].split()
+            read_bytes = write_bytes = float("nan")
+            if self.io is not None:
+                counters = dict(line.split(": ") for line in read_attribute(self.io).splitlines())
+                read_bytes, write_bytes = float(counters["read_bytes"]), float(counters["write_bytes"])
+            return ((int(fields[STAT_UTIME]) + int(fields[STAT_STIME])) / CLOCK_TICKS, int(fields[STAT_RSS]) * float(PAGE_SIZE),
+                    read_bytes, write_bytes)
+        except (OSError, IndexError, ValueError, psutil.Error):
+            return None
+
+    def close(self):
+        for fd in (self.stat, self.io):
+            if fd is not None:
+                os.close(fd)
+
+class CgroupReader:
+    """
+    Cumulative CPU seconds, memory and I/O bytes of a cgroup v2 group from its cpu.stat,
+    memory.current and io.stat files. read() returns None once the group is gone.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.cpu = open_attribute(os.path.join(path, "cpu.stat"))
+        self.memory = open_attribute(os.path.join(path, "memory.current"))
+        self.io = open_attribute(os.path.join(path, "io.stat"))
+
+    def read(self):
+        try:
+            if self.cpu is None:
+                return None
+            usage = dict(line.split() for line in read_attribute(self.cpu).splitlines())
+            memory = float(read_attribute(self.memory)) if self.memory is not None else float("nan")
+            read_bytes = write_bytes = float("nan")
+            if self.io is not None:
+                read_bytes = write_bytes = 0.0
+                for line in read_attribute(self.io).splitlines():
+                    counters = dict(item.split("=") for item in line.split()[1:])
+                    read_bytes += float(counters.get("rbytes", 0))
+                    write_bytes += float(counters.get("wbytes", 0))
+            return int(usage["usage_usec"]) / 1e6, memory, read_bytes, write_bytes
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def close(self):
+        for fd in (self.cpu, self.memory, self.io):
+            if fd is not None:
+                os.close(fd)
+
+class Target:
+    """
+    One attributed target: processes whose name or command line contains a pattern ('process')
+    or the process tree of a pid ('pid'), both with their descendants, or the cgroups matching a
+    glob under the cgroup v2 mount ('cgroup'; the glob should not match nested groups, which
+    would be counted twice). Members are re-discovered with discover(); every sample() only
+    re-reads the members' open stat files.
+    Counters are kept as deltas per member, so members that exit keep what they used. Members
+    that appear after the first discovery count from zero, earlier ones from the first read.
+    """
+
+    def __init__(self, label, kind, value, proc_root="/proc", cgroup_root="/sys/fs/cgroup"):
+        self.label, self.kind, self.value = label, kind, value
+        self.proc_root, self.cgroup_root = proc_root, cgroup_root
+        self.readers = {}
+        self.last = {}
+        self.discovered = False
+        self.totals = [0.0, 0.0, 0.0]   # CPU seconds, read bytes, write bytes
+
+    def matches(self, process):
+        name = process.info["name"] or ""
+        cmdline = " ".join(process.info["cmdline"] or [])
+        return self.value in name or self.value in cmdline
+
+    def members(self, processes):
+        """
+        Keys of the current members: pids for process targets, cgroup paths for cgroup targets.
+        """
+        if self.kind == "cgroup":
+            return {path for path in glob.glob(os.path.join(self.cgroup_root, self.value)) if os.path.isdir(path)}
+        if self.kind == "pid":
+            roots = {int(self.value)} if self.value.isdigit() else set()
+        else:
+            # The monitor's own command line contains the pattern
+            roots = {process.pid for process in processes if process.pid != os.getpid() and self.matches(process)}
+        # Add descendants, e.g. the JVM started by the jmeter shell script
+        children = {}
+        for process in processes:
+            children.setdefault(process.info["ppid"], []).append(process.pid)
+        members, stack = set(), [pid for pid in roots]
+        while stack:
+            pid = stack.pop()
+            if pid not in members:
+                members.add(pid)
+                stack.extend(children.get(pid, []))
+        return members & {process.pid for process in processes}
+
+    def discover(self, processes):
+        """
+        Start reading new members; processes is a list from psutil.process_iter(['name', 'cmdline', 'ppid']).
+        """
+        for key in self.members(processes) - set(self.readers):
+            try:
+                reader = CgroupReader(key) if self.kind == "cgroup" else ProcessReader(key, self.proc_root)
+            except psutil.Error:
+                continue
+            first = reader.read()
+            if first is None:
+                reader.close()
+                continue
+            self.readers[key] = reader
+            self.last[key] = first if not self.discovered else (0.0, first[1], 0.0, 0.0)
+        self.discovered = True
+
+    def sample(self):
+        """
+        (members, cumulative CPU seconds, RSS/memory bytes, cumulative read bytes, cumulative write bytes);
+        memory and I/O are NaN when no member's counters are readable.
+        """
+        rss = read_bytes = write_bytes = float("nan")
+        for key, reader in list(self.readers.items()):
+            reading = reader.read()
+            if reading is None:
+                # Exited: its usage up to the last read stays in the totals
+                reader.close()
+                del self.readers[key], self.last[key]
+                continue
+            previous = self.last[key]
+            self.totals[0] += reading[0] - previous[0]
+            if not math.isnan(reading[1]):
+                rss = (0.0 if math.isnan(rss) else rss) + reading[1]
+            if not math.isnan(reading[2]):
+                self.totals[1] += reading[2] - (reading[2] if math.isnan(previous[2]) else previous[2])
+                self.totals[2] += reading[3] - (reading[3] if math.isnan(previous[3]) else previous[3])
+                read_bytes, write_bytes = self.totals[1], self.totals[2]
+            self.last[key] = reading
+        return len(self.readers), self.totals[0], rss, read_bytes, write_bytes
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from jtl_analyzer import merge_sketches
+
+########### Global Declarations #########
+
+# Bump on any change to the fields below; consumers can rely on names, order and dtypes per version
+SCHEMA_VERSION = 1
+
+TRANSACTION_FIELDS = [
+    ("transaction", "U"),
+    ("sampleCount", np.int64),
+    ("errorCount", np.int64),
+    ("errorPct", np.float64),
+    ("meanResTime", np.float64),
+    ("medianResTime", np.float64),
+    ("minResTime", np.float64),
+    ("maxResTime", np.float64),
+    ("pct1ResTime", np.float64),
+    ("pct2ResTime", np.float64),
+    ("pct3ResTime", np.float64),
+    ("throughput", np.float64),
+    ("receivedKBytesPerSec", np.float64),
+    ("sentKBytesPerSec", np.float64),
+]
+
+TIMELINE_FIELDS = [
+    ("transaction", "U"),
+    ("time", np.int64),
+    ("throughput", np.float64),
+    ("sampleCount", np.int64),
+    ("errorPct", np.float64),
+    ("meanResTime", np.float64),
+    ("p50", np.float64),
+    ("p90", np.float64),
+    ("p95", np.float64),
+    ("p99", np.float64),
+]
+
+
+########### Code  #########
+
+def transaction_records(statistics):
+    return [{name: row.get(name) for name, _ in TRANSACTION_FIELDS} for row in statistics.values()]
+
+def timeline_records(timeline):
+    return [dict({name: window.get(name) for name, _ in TIMELINE_FIELDS}, transaction=label)
+            for label, series in timeline["series"].items() for window in series]
+
+def write_jsonl(path, run_id, records):
+    """
+    One JSON object per line, each tagged with the schema version and run id.
+    """
+    with open(path, "w") as wf:
+        wf.writelines(json.dumps(dict({"schema_version": SCHEMA_VERSION, "run_id": run_id}, **record), separators=(",", ":")) + "\n"
+                      for record in records)
+
+def columns(records, fields, prefix):
+    """
+    Column arrays named "<prefix>.<field>" with the schema dtypes.
+    """
+    arrays = {}
+    for name, dtype in fields:
+        values = [record[name] for record in records]
+        arrays[f"{prefix}.{name}"] = np.array(values, dtype=dtype if dtype != "U" else str) if values else np.zeros(0, dtype=dtype if dtype != "U" else "U1")
+    return arrays
+
+def write_columnar(path, run_id, transactions, timeline=None):
+    """
+    Uncompressed .npz with one array per column: small, and loadable without parsing.
+    """
+    arrays = columns(transactions, TRANSACTION_FIELDS, "transactions")
+    if timeline is not None:
+        arrays.update(columns(timeline, TIMELINE_FIELDS, "timeline"))
+    np.savez(path, schema_version=np.array(SCHEMA_VERSION), run_id=np.array(str(run_id)), **arrays)
+
+def load_runs(paths, table="transactions"):
+    """
+    Concatenate one table ("transactions" or "timeline") of many exported runs into a single
+    dict of columns, with a run_id column added. Runs with another schema version are rejected.
+    """
+    parts = {}
+    for path in paths:
+        with np.load(path) as data:
+            if int(data["schema_version"]) != SCHEMA_VERSION:
+                raise ValueError(f"'{path}' uses schema version {int(data['schema_version'])}, expected {SCHEMA_VERSION}")
+            names = [key for key in data.files if key.startswith(table + ".")]
+            size = len(data[names[0]]) if names else 0
+            parts.setdefault("run_id", []).append(np.full(size, str(data["run_id"])))
+            for key in names:
+                parts.setdefault(key[len(table) + 1:], []).append(data[key])
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+def main(run_id, output_dir, statistics_path=None, sketch=None, timeline_path=None):
+    try:
+        if sketch:
+            statistics = merge_sketches(sketch).statistics()
+        else:
+            with open(statistics_path, "r") as rf:
+                statistics = json.load(rf)
+        timeline = None
+        if timeline_path:
+            with open(timeline_path, "r") as rf:
+                timeline = timeline_records(json.load(rf))
+    except (OSError, ValueError) as e:
+        print(f"Error reading results: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    os.makedirs(output_dir, exist_ok=True)
+    transactions = transaction_records(statistics)
+    base = os.path.join(output_dir, f"run-{run_id}")
+    write_jsonl(f"{base}.transactions.jsonl", run_id, transactions)
+    if timeline is not None:
+        write_jsonl(f"{base}.timeline.jsonl", run_id, timeline)
+    write_columnar(f"{base}.npz", run_id, transactions, timeline)
+    print(f"Exported run {run_id} to '{base}.*'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export per-transaction aggregates and timelines as JSON Lines and columnar .npz files.")
+    parser.add_argument("--run-id", required=True, help="Run id stored in every record (e.g. the build number)")
+    parser.add_argument("--output-dir", default=".", help="Directory for run-<id>.transactions.jsonl, run-<id>.timeline.jsonl and run-<id>.npz")
+    parser.add_argument("--statistics", help="statistics.json from jtl_analyzer.py or the JMeter dashboard")
+    parser.add_argument("--sketch", nargs="+", help="Sketch files from jtl_analyzer.py to merge instead of reading --statistics")
+    parser.add_argument("--timeline", help="Timeline file from jtl_analyzer.py --timeline")
+    args = parser.parse_args()
+
+    if not args.statistics and not args.sketch:
+        parser.error("either --statistics or --sketch is required")
+    main(args.run_id, args.output_dir, args.statistics, args.sketch, args.timeline)
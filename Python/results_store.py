@@ -0,0 +1,236 @@
+import math
+import sqlite3
+import time
+import numpy as np
+from jtl_analyzer import BUCKETS
+
+########### Global Declarations #########
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    transaction_name TEXT NOT NULL,
+    sample_count INTEGER,
+    error_count INTEGER,
+    error_pct REAL,
+    mean_res_time REAL,
+    median_res_time REAL,
+    min_res_time REAL,
+    max_res_time REAL,
+    pct1_res_time REAL,
+    pct2_res_time REAL,
+    pct3_res_time REAL,
+    throughput REAL,
+    histogram BLOB,
+    PRIMARY KEY (run_id, transaction_name)
+);
+CREATE TABLE IF NOT EXISTS efficiency (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    transaction_name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    sample_count INTEGER,
+    duration REAL,
+    energy REAL,
+    cpu_seconds REAL,
+    PRIMARY KEY (run_id, transaction_name, source)
+);
+"""
+
+# statistics.json field -> transactions column
+COLUMNS = {
+    "sampleCount": "sample_count",
+    "errorCount": "error_count",
+    "errorPct": "error_pct",
+    "meanResTime": "mean_res_time",
+    "medianResTime": "median_res_time",
+    "minResTime": "min_res_time",
+    "maxResTime": "max_res_time",
+    "pct1ResTime": "pct1_res_time",
+    "pct2ResTime": "pct2_res_time",
+    "pct3ResTime": "pct3_res_time",
+    "throughput": "throughput",
+}
+
+DEFAULT_THRESHOLDS = {
+    "alpha": 0.05,
+    "max_p95_increase_pct": 20,
+    "max_throughput_decrease_pct": 20,
+    "max_error_pct_increase": 1,
+    "max_p95_ms": None,
+    "max_error_pct": None,
+}
+
+
+########### Code  #########
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def encode_histogram(histogram):
+    """
+    Store only the non-empty buckets: int64 (bucket, count) pairs.
+    """
+    buckets = np.flatnonzero(histogram)
+    return np.stack((buckets, histogram[buckets])).astype(np.int64).tobytes()
+
+def decode_histogram(blob):
+    if blob is None:
+        return None
+    buckets, counts = np.frombuffer(blob, dtype=np.int64).reshape(2, -1)
+    histogram = np.zeros(BUCKETS, dtype=np.int64)
+    histogram[buckets] = counts
+    return histogram
+
+def store_run(conn, run_id, statistics, stats=None):
+    """
+    Save one run's statistics (statistics.json structure). With the JtlStats the run was
+    computed from, the response time histograms are stored too, which the KS test needs.
+    Storing the same run_id again replaces it.
+    """
+    histograms = {}
+    if stats is not None:
+        histograms = {label: stats.histogram[index] for label, index in stats.labels.items()}
+        histograms["Total"] = stats.histogram.sum(axis=0)
+
+    with conn:
+        conn.execute("DELETE FROM transactions WHERE run_id = ?", (run_id,))
+        conn.execute("INSERT OR REPLACE INTO runs (run_id, created) VALUES (?, ?)", (run_id, time.time()))
+        conn.executemany(
+            f"INSERT INTO transactions (run_id, transaction_name, {', '.join(COLUMNS.values())}, histogram) "
+            f"VALUES ({', '.join('?' * (len(COLUMNS) + 3))})",
+            [(run_id, name) + tuple(row.get(field) for field in COLUMNS)
+             + (encode_histogram(histograms[name]) if name in histograms else None,)
+             for name, row in statistics.items()])
+
+def load_run(conn, run_id):
+    """
+    Statistics of a stored run keyed by transaction, each with a 'histogram' (or None).
+    """
+    cursor = conn.execute(
+        f"SELECT transaction_name, {', '.join(COLUMNS.values())}, histogram FROM transactions WHERE run_id = ?", (run_id,))
+    result = {}
+    for record in cursor:
+        row = dict(zip(COLUMNS, record[1:-1]))
+        row["transaction"] = record[0]
+        row["histogram"] = decode_histogram(record[-1])
+        result[record[0]] = row
+    return result
+
+def previous_run_id(conn, run_id):
+    """
+    The most recently stored run other than run_id that has transaction statistics, or None.
+    """
+    found = conn.execute(
+        "SELECT runs.run_id FROM runs WHERE runs.run_id != ? AND EXISTS (SELECT 1 FROM transactions WHERE transactions.run_id = runs.run_id) "
+        "ORDER BY created DESC LIMIT 1", (run_id,)).fetchone()
+    return found[0] if found else None
+
+def store_efficiency(conn, run_id, efficiency):
+    """
+    Save the energy and CPU time attributed to every transaction and source (efficiency.py
+    structure). Storing the same run_id again replaces it.
+    """
+    with conn:
+        conn.execute("DELETE FROM efficiency WHERE run_id = ?", (run_id,))
+        conn.execute("INSERT OR IGNORE INTO runs (run_id, created) VALUES (?, ?)", (run_id, time.time()))
+        conn.executemany(
+            "INSERT INTO efficiency (run_id, transaction_name, source, sample_count, duration, energy, cpu_seconds) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, name, source, row["sampleCount"], efficiency["duration"], usage["energy"], usage["cpuSeconds"])
+             for name, row in efficiency["transactions"].items() for source, usage in row["sources"].items()])
+
+def load_efficiency(conn, run_id):
+    """
+    {transaction: {source: {sampleCount, duration, energy, cpuSeconds}}} of a stored run.
+    """
+    result = {}
+    cursor = conn.execute(
+        "SELECT transaction_name, source, sample_count, duration, energy, cpu_seconds FROM efficiency WHERE run_id = ?", (run_id,))
+    for name, source, sample_count, duration, energy, cpu_seconds in cursor:
+        result.setdefault(name, {})[source] = {"sampleCount": sample_count, "duration": duration, "energy": energy, "cpuSeconds": cpu_seconds}
+    return result
+
+def previous_efficiency_run_id(conn, run_id):
+    """
+    The most recently stored run other than run_id that has efficiency data, or None.
+    """
+    found = conn.execute(
+        "SELECT runs.run_id FROM runs WHERE runs.run_id != ? AND EXISTS (SELECT 1 FROM efficiency WHERE efficiency.run_id = runs.run_id) "
+        "ORDER BY created DESC LIMIT 1", (run_id,)).fetchone()
+    return found[0] if found else None
+
+def ks_test(baseline, current, alpha):
+    """
+    Two-sample Kolmogorov-Smirnov test on two response time histograms with the same bucket
+    layout. Returns (D statistic, critical value, significant).
+    """
+    n, m = baseline.sum(), current.sum()
+    if not n or not m:
+        return 0.0, math.inf, False
+    statistic = float(np.abs(np.cumsum(baseline) / n - np.cumsum(current) / m).max())
+    critical = math.sqrt(-math.log(alpha / 2) / 2) * math.sqrt((n + m) / (n * m))
+    return statistic, critical, statistic > critical
+
+def compare_runs(baseline, current, thresholds=None):
+    """
+    Per transaction comparison of current against baseline. A latency change only counts as a
+    regression when it exceeds its threshold and the response time distributions differ
+    significantly (KS test; assumed significant when histograms are missing). Throughput and
+    error rate changes are compared against their thresholds directly.
+    Absolute SLAs (max_p95_ms, max_error_pct) apply to the current run alone.
+    Returns a list of dicts with the deltas and a 'breaches' list per transaction.
+    """
+    limits = dict(DEFAULT_THRESHOLDS, **{key: value for key, value in (thresholds or {}).items() if key in DEFAULT_THRESHOLDS})
+    results = []
+    for name, row in current.items():
+        base = baseline.get(name)
+        result = {"transaction": name, "p95": row["pct2ResTime"], "throughput": row["throughput"],
+                  "errorPct": row["errorPct"], "breaches": []}
+        if base:
+            change = lambda now, before: (now - before) * 100.0 / before if before else 0.0
+            result.update({
+                "baselineP95": base["pct2ResTime"],
+                "p95ChangePct": change(row["pct2ResTime"], base["pct2ResTime"]),
+                "baselineThroughput": base["throughput"],
+                "throughputChangePct": change(row["throughput"], base["throughput"]),
+                "errorPctChange": row["errorPct"] - base["errorPct"],
+            })
+            if base.get("histogram") is not None and row.get("histogram") is not None:
+                result["ksStatistic"], result["ksCritical"], significant = ks_test(base["histogram"], row["histogram"], limits["alpha"])
+            else:
+                significant = True
+            result["significant"] = significant
+
+            if significant and result["p95ChangePct"] > limits["max_p95_increase_pct"]:
+                result["breaches"].append(f"p95 +{result['p95ChangePct']:.1f}% (limit {limits['max_p95_increase_pct']}%)")
+            if -result["throughputChangePct"] > limits["max_throughput_decrease_pct"]:
+                result["breaches"].append(f"throughput {result['throughputChangePct']:.1f}% (limit -{limits['max_throughput_decrease_pct']}%)")
+            if result["errorPctChange"] > limits["max_error_pct_increase"]:
+                result["breaches"].append(f"errors +{result['errorPctChange']:.2f} pts (limit {limits['max_error_pct_increase']})")
+        if limits["max_p95_ms"] is not None and row["pct2ResTime"] > limits["max_p95_ms"]:
+            result["breaches"].append(f"p95 {row['pct2ResTime']:g} ms (SLA {limits['max_p95_ms']} ms)")
+        if limits["max_error_pct"] is not None and row["errorPct"] > limits["max_error_pct"]:
+            result["breaches"].append(f"errors {row['errorPct']:.2f}% (SLA {limits['max_error_pct']}%)")
+        results.append(result)
+    return results
+
+def run_statistics(statistics, stats=None):
+    """
+    Current run in load_run's shape, so it can be compared before (or without) being stored.
+    """
+    result = {}
+    for name, row in statistics.items():
+        result[name] = dict(row)
+        index = stats.labels.get(name) if stats is not None else None
+        if stats is None:
+            result[name]["histogram"] = None
+        elif name == "Total":
+            result[name]["histogram"] = stats.histogram.sum(axis=0)
+        else:
+            result[name]["histogram"] = stats.histogram[index] if index is not None else None
+    return result
@@ -0,0 +1,87 @@
+import re
+from fnmatch import fnmatchcase
+from jtl_analyzer import histogram_fraction_below
+
+########### Global Declarations #########
+
+# SLA key -> (statistics.json field, percentile checked against the histogram)
+PERCENTILE_LIMITS = {
+    "p50_ms": ("medianResTime", 50),
+    "p90_ms": ("pct1ResTime", 90),
+    "p95_ms": ("pct2ResTime", 95),
+    "p99_ms": ("pct3ResTime", 99),
+}
+
+DEFAULT_APDEX_T_MS = 500
+
+
+########### Code  #########
+
+def matches(pattern, name):
+    """
+    Glob match on the transaction name, or a regular expression when prefixed with 're:'.
+    """
+    if pattern.startswith("re:"):
+        return re.search(pattern[3:], name) is not None
+    return fnmatchcase(name, pattern)
+
+def transaction_rules(sla, name):
+    """
+    Merge the SLA rules that apply to a transaction; later matching rules override earlier ones.
+    """
+    rules = {"apdex_t_ms": sla.get("apdex_t_ms", DEFAULT_APDEX_T_MS)}
+    for rule in sla.get("transactions") or []:
+        if matches(str(rule.get("match", "*")), name):
+            rules.update({key: value for key, value in rule.items() if key != "match"})
+    return rules
+
+def apdex(histogram, threshold_ms):
+    """
+    Apdex score: (satisfied + tolerating / 2) / samples, satisfied <= T < tolerating <= 4T.
+    """
+    satisfied = histogram_fraction_below(histogram, threshold_ms)
+    tolerating = histogram_fraction_below(histogram, 4 * threshold_ms) - satisfied
+    return satisfied + tolerating / 2
+
+def evaluate(sla, statistics, stats=None):
+    """
+    Check every transaction in statistics (statistics.json structure) against its SLA rules.
+    Percentile limits are checked on the response time histograms when the JtlStats is
+    available (share of samples within the limit), otherwise on the reported percentile.
+    Returns {transaction: {"apdex": score or None, "checks": {field: passed}, "breaches": [...]}}.
+    """
+    results = {}
+    for name, row in statistics.items():
+        rules = transaction_rules(sla, name)
+        histogram = None
+        if stats is not None:
+            histogram = stats.histogram.sum(axis=0) if name == "Total" else stats.histogram[stats.labels[name]] if name in stats.labels else None
+
+        result = {"apdex": apdex(histogram, rules["apdex_t_ms"]) if histogram is not None else None, "checks": {}, "breaches": []}
+        for key, (field, percentile) in PERCENTILE_LIMITS.items():
+            if key not in rules:
+                continue
+            if histogram is not None:
+                within = histogram_fraction_below(histogram, rules[key]) * 100
+                passed = within >= percentile
+                detail = f"{within:.1f}% within {rules[key]} ms (needs {percentile}%)"
+            else:
+                passed = row[field] <= rules[key]
+                detail = f"{row[field]:g} ms (SLA {rules[key]} ms)"
+            result["checks"][field] = passed
+            if not passed:
+                result["breaches"].append(f"p{percentile} {detail}")
+        if "mean_ms" in rules:
+            result["checks"]["meanResTime"] = row["meanResTime"] <= rules["mean_ms"]
+            if not result["checks"]["meanResTime"]:
+                result["breaches"].append(f"mean {row['meanResTime']:.1f} ms (SLA {rules['mean_ms']} ms)")
+        if "error_pct" in rules:
+            result["checks"]["errorPct"] = row["errorPct"] <= rules["error_pct"]
+            if not result["checks"]["errorPct"]:
+                result["breaches"].append(f"errors {row['errorPct']:.2f}% (SLA {rules['error_pct']}%)")
+        if "min_apdex" in rules and result["apdex"] is not None:
+            result["checks"]["apdex"] = result["apdex"] >= rules["min_apdex"]
+            if not result["checks"]["apdex"]:
+                result["breaches"].append(f"Apdex {result['apdex']:.2f} (SLA {rules['min_apdex']})")
+        results[name] = result
+    return results
@@ -1,157 +1,292 @@
-import sys
+import argparse
+import signal
 import psutil
 import time
 from datetime import datetime
 import matplotlib.pyplot as plt
-import random
 import os
+import numpy as np
+from host_metrics import CpuTimes, RaplEnergy, ThermalZones
+from metrics_store import MetricsWriter, read_header, read_metrics
+from process_metrics import Target, parse_target
 
-# File to indicate the monitoring status
+# File to indicate the monitoring status; holds the pid of the monitoring process
 LOCK_FILE = "sustainability_metrics.lock"
 
-# Initialize lists to store data
-timestamps = []
-battery_percentages = []
-cpu_usages = []
-temperatures = []
-uptime = []
-idle_times = []
-active_cores = []
-# active_threads = []
-avg_power_per_core = []
-# avg_power_per_thread = []
+# Samples are appended to this file as fixed-width records, so 'stop' (another process) and other
+# tools can read them back; only a small buffer is kept in memory however long the run is
+METRICS_FILE = "sustainability_metrics.bin"
+METRICS_FIELDS = [
+    ("time", "f8"),                 # Epoch seconds
+    ("battery", "f4"),              # %, NaN without a battery
+    ("cpu", "f4"),                  # %
+    ("temperature", "f4"),          # °C, hottest thermal zone; NaN without one
+    ("uptime", "f8"),               # Seconds
+    ("idle", "f4"),                 # %
+    ("active_cores", "i4"),
+    ("avg_power_per_core", "f4"),   # W, package power / physical cores; NaN without RAPL
+    ("power", "f4"),                # W, RAPL package power since the previous sample
+    ("energy", "f8"),               # J, RAPL package energy since the start
+]
+# Followed by one "core_<n>" utilization (%) field per logical CPU
+
+# Per-target series (--process/--pid/--cgroup), one record per target and sample, in the same format;
+# the target index refers to the "targets" list in the file header
+TARGETS_FILE = "sustainability_targets.bin"
+TARGET_FIELDS = [
+    ("time", "f8"),                 # Epoch seconds
+    ("target", "i4"),               # Index into the header's targets
+    ("members", "i4"),              # Processes or cgroups currently tracked
+    ("cpu_seconds", "f8"),          # CPU time used since the start
+    ("cpu", "f4"),                  # % of one core since the previous sample
+    ("rss", "f8"),                  # Bytes (memory.current for cgroups)
+    ("read_bytes", "f8"),           # Disk bytes read since the start; NaN when not readable
+    ("write_bytes", "f8"),          # Disk bytes written since the start; NaN when not readable
+    ("energy", "f8"),               # J, the target's share of the RAPL package energy by CPU time
+]
+
+# Targets are sampled at most every TARGET_INTERVAL seconds; new matching processes/cgroups are
+# looked for every DISCOVERY_INTERVAL seconds (a full process scan), the rest are incremental reads
+TARGET_INTERVAL = 0.1
+DISCOVERY_INTERVAL = 2.0
+
+# Seconds 'stop' waits for the monitoring process to write its last samples
+STOP_TIMEOUT = 30
+
+# Samples per second by default; slow-changing metrics (battery, temperature) are read
+# at most every SLOW_METRICS_INTERVAL seconds and the log gets one line per LOG_INTERVAL seconds
+DEFAULT_RATE = 1.0
+SLOW_METRICS_INTERVAL = 1.0
+LOG_INTERVAL = 1.0
+
+# The graph averages samples down to at most this many points
+MAX_PLOT_POINTS = 2000
 
 log_file = "sustainability_metrics.log"  # Name of the log file
 
-# Function to write data to a file
-def log_data_to_file(data):
-    """Append data to the log file."""
-    with open(log_file, "a") as file:
-        file.write(data + "\n")
+# Set by SIGTERM/SIGINT; the sampling loop finishes its current sample and exits
+stop_requested = False
 
-def get_temperature():
-    """Simulate system temperature as macOS has restrictive APIs."""
-    return random.uniform(30, 90)  # Simulated temperature (°C)
+def request_stop(signum, frame):
+    """Signal handler for a clean stop."""
+    global stop_requested
+    stop_requested = True
 
 def get_uptime():
     """Get system uptime in seconds."""
     return int(time.time() - psutil.boot_time())
 
-def get_idle_time():
-    """Simulate idle time percentage."""
-    return random.uniform(0, 20)  # Simulated idle time (%)
-
-def get_avg_power_per_core(cpu_usage):
-    """Simulate average power usage per core."""
-    num_cores = psutil.cpu_count(logical=False)
-    return (cpu_usage / num_cores) * random.uniform(0.5, 1.5)  # Simulated power usage (W)
-
-def get_avg_power_per_thread(cpu_usage, num_threads):
-    """Simulate average power consumption per thread."""
-    return (cpu_usage / num_threads) * random.uniform(0.1, 0.5)  # Simulated power usage (W)
-
-def monitor_sustainability_metrics():
-    print("Monitoring sustainability metrics... (Press Ctrl+C to stop)")
+def metrics_fields(cores):
+    """Fields of the metrics file for a host with this many logical CPUs."""
+    return METRICS_FIELDS + [(f"core_{core}", "f4") for core in range(cores)]
+
+def monitor_sustainability_metrics(rate=DEFAULT_RATE, sysfs_root="/sys", proc_root="/proc", targets=None):
+    """Sample on a fixed monotonic schedule at rate Hz until SIGTERM/SIGINT.
+    Readings come from sysfs_root and proc_root, which can point at a copied or fake tree.
+    targets: Target objects whose CPU, memory, I/O and energy share are recorded separately."""
+    print(f"Monitoring sustainability metrics at {rate:g} Hz... (Press Ctrl+C to stop)")
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    period = 1.0 / rate
+    # CPU usage is the delta since the previous read, so sampling never blocks
+    cpu_times = CpuTimes(proc_root)
+    rapl = RaplEnergy(sysfs_root)
+    thermal = ThermalZones(sysfs_root)
+    active_cores_count = cpu_times.cores
+    physical_cores = psutil.cpu_count(logical=False) or active_cores_count
+    boot_time = psutil.boot_time()
+    sources = {"proc_stat": cpu_times.file is not None, "rapl_domains": len(rapl.domains), "thermal_zones": len(thermal.zones)}
+    print(f"Sources: {sources}")
+
+    writer = MetricsWriter(METRICS_FILE, metrics_fields(active_cores_count), buffer_records=max(int(rate * 5), 16),
+                           meta={"pid": os.getpid(), "started": time.time(), "rate": rate, "sources": sources})
+    log = open(log_file, "a", buffering=1 << 16)
+    energy, energy_at = rapl.sample(), time.monotonic()
+
+    targets = targets or []
+    target_writer = None
+    if not targets and os.path.exists(TARGETS_FILE):
+        # Leftover from an earlier run
+        os.remove(TARGETS_FILE)
+    if targets:
+        target_writer = MetricsWriter(TARGETS_FILE, TARGET_FIELDS, buffer_records=max(int(min(rate, 1 / TARGET_INTERVAL) * 5 * len(targets)), 16),
+                                      meta={"started": time.time(), "targets": [{"label": target.label, "kind": target.kind, "value": target.value} for target in targets]})
+    target_cpu = [0.0 for _ in targets]         # CPU seconds at the previous target sample
+    target_energy = [0.0 for _ in targets]
+    attributed = (cpu_times.busy_seconds, energy)
+
+    started, started_cpu = time.monotonic(), time.process_time()
+    next_tick = next_slow = next_log = next_target = next_discovery = target_at = started
+    samples = missed = 0
+    busy = lag_total = lag_max = 0.0
     try:
-        while os.path.exists(LOCK_FILE):
+        while not stop_requested:
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if stop_requested:
+                break
+            tick = time.monotonic()
+            lag = tick - next_tick
+            lag_total += lag
+            lag_max = max(lag_max, lag)
+
             # Capture current timestamp
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            timestamps.append(timestamp)
+            now = time.time()
 
-            # Battery metrics
-            battery = psutil.sensors_battery()
-            if battery:
-                battery_percentages.append(battery.percent)
-            else:
-                battery_percentages.append(None)
+            # CPU metrics: host and per core utilization, idle time
+            busy_pct = cpu_times.sample()
+            cpu_usage = round(float(busy_pct[0]), 1)
+            idle_time = round(100.0 - cpu_usage, 1)
 
-            # CPU metrics
-            cpu_usage = psutil.cpu_percent(interval=1)
-            cpu_usages.append(cpu_usage)
+            if tick >= next_slow:
+                # Battery metrics
+                battery = psutil.sensors_battery()
+                battery_percentage = battery.percent if battery else None
 
-            # System temperature (Simulated)
-            temperatures.append(get_temperature())
+                # System temperature (hottest thermal zone)
+                temperature = thermal.sample()
+                next_slow = tick + SLOW_METRICS_INTERVAL
 
             # System uptime
-            uptime.append(get_uptime())
-
-            # Idle time (Simulated)
-            idle_times.append(get_idle_time())
-
-            # Active cores
-            active_cores_count = psutil.cpu_count(logical=True)
-            active_cores.append(active_cores_count)
-
-            # Active threads and threads power usage
-            # try:
-            #     # Active threads
-            #     threads = sum([p.num_threads() for p in psutil.process_iter()])
-            #     active_threads.append(threads)
-            # except (psutil.AccessDenied, psutil.NoSuchProcess) as e:
-            #     #print(f"Access denied or process not found while fetching threads: {e}")
-            #     active_threads.append(0)  # Default value if access denied
-
-
-            # Avg power per core
-            avg_core_power = get_avg_power_per_core(cpu_usage)
-            avg_power_per_core.append(avg_core_power)
-
-            #Avg power per thread
-            # avg_thread_power = get_avg_power_per_thread(cpu_usage, threads)
-            # avg_power_per_thread.append(avg_thread_power)
-
-            # Print current metrics
-            # print(f"[{timestamp}] Battery: {battery_percentages[-1]}% | CPU: {cpu_usages[-1]}% | Active Cores: {active_cores[-1]} | temperatures: {temperatures[-1]} C | idle_times: {idle_times[-1]} | uptime:{uptime[-1]} ")
-            
-            # Prepare data for logging
-            log_entry = (f"[{timestamp}] Battery: {battery_percentages[-1]}% | CPU: {cpu_usages[-1]}% | Active Cores: {active_cores[-1]} | "
-                        f"Temperatures: {temperatures[-1]} C | Idle Times: {idle_times[-1]} | Uptime: {uptime[-1]}")
-        
-            log_data_to_file(log_entry)
-            
-            # Wait for n seconds
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\nMonitoring stopped.")
-        stop_monitoring()
+            system_uptime = int(now - boot_time)
+
+            # Package power from the RAPL energy counters, and per physical core
+            previous_energy, previous_at = energy, energy_at
+            energy, energy_at = rapl.sample(), time.monotonic()
+            power = (energy - previous_energy) / (energy_at - previous_at) if energy_at > previous_at else np.nan
+            avg_core_power = power / physical_cores
+
+            writer.append((now, np.nan if battery_percentage is None else battery_percentage, cpu_usage, temperature,
+                           system_uptime, idle_time, active_cores_count, avg_core_power, power, energy, *busy_pct[1:]))
+
+            if targets and tick >= next_discovery:
+                processes = list(psutil.process_iter(["name", "cmdline", "ppid"])) if any(target.kind != "cgroup" for target in targets) else []
+                for target in targets:
+                    target.discover(processes)
+                next_discovery = tick + DISCOVERY_INTERVAL
+
+            if targets and tick >= next_target:
+                # Host energy since the previous target sample is shared out by CPU time used
+                host_busy = cpu_times.busy_seconds - attributed[0]
+                host_energy = energy - attributed[1]
+                attributed = (cpu_times.busy_seconds, energy)
+                interval = max(tick - target_at, 1e-9)
+                for index, target in enumerate(targets):
+                    members, cpu_seconds, rss, read_bytes, write_bytes = target.sample()
+                    used = cpu_seconds - target_cpu[index]
+                    if host_busy > 0 and not np.isnan(host_energy):
+                        target_energy[index] += host_energy * min(used / host_busy, 1.0)
+                    target_writer.append((now, index, members, cpu_seconds, used * 100.0 / interval, rss, read_bytes, write_bytes,
+                                          target_energy[index] if not np.isnan(energy) else np.nan))
+                    target_cpu[index] = cpu_seconds
+                target_at = tick
+                next_target = tick + TARGET_INTERVAL
+
+            if tick >= next_log:
+                timestamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+                log.write(f"[{timestamp}] Battery: {battery_percentage}% | CPU: {cpu_usage}% | Active Cores: {active_cores_count} | "
+                          f"Temperatures: {temperature:.1f} C | Idle Times: {idle_time} | Uptime: {system_uptime} | "
+                          f"Power: {power:.1f} W | Energy: {energy:.1f} J\n")
+                next_log = tick + LOG_INTERVAL
+
+            samples += 1
+            busy += time.monotonic() - tick
+            # Next tick on the fixed grid (no drift); ticks already missed are skipped, not bunched up
+            next_tick += period
+            behind = time.monotonic() - next_tick
+            if behind > 0:
+                skipped = int(behind // period) + 1
+                missed += skipped
+                next_tick += skipped * period
+    finally:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        overhead = {
+            "samples": samples,
+            "seconds": round(elapsed, 3),
+            "achieved_rate": round(samples / elapsed, 3),
+            "missed_ticks": missed,
+            "mean_lag_ms": round(lag_total * 1000 / max(samples, 1), 3),
+            "max_lag_ms": round(lag_max * 1000, 3),
+            "mean_sample_ms": round(busy * 1000 / max(samples, 1), 3),
+            "cpu_seconds": round(time.process_time() - started_cpu, 3),
+            "cpu_pct_of_one_core": round((time.process_time() - started_cpu) * 100 / elapsed, 3),
+        }
+        writer.update_meta({"overhead": overhead})
+        writer.close()
+        if target_writer is not None:
+            target_writer.close()
+        for target in targets:
+            target.close()
+        cpu_times.close()
+        rapl.close()
+        thermal.close()
+        log.write(f"Monitor overhead: {overhead}\n")
+        log.close()
+        print(f"\nMonitoring stopped. Overhead: {overhead}")
+
+def downsample(samples):
+    """Average consecutive samples so that at most MAX_PLOT_POINTS remain, per field."""
+    step = -(-len(samples) // MAX_PLOT_POINTS)
+    starts = np.arange(0, len(samples), step)
+    counts = np.diff(np.append(starts, len(samples)))
+    return {name: np.add.reduceat(samples[name].astype(np.float64), starts) / counts for name in samples.dtype.names}
+
+def generate_target_graph():
+    """Plot the CPU usage of every tracked target and print what each one used."""
+    if not os.path.exists(TARGETS_FILE):
+        return
+    _, meta = read_header(TARGETS_FILE)
+    samples = read_metrics(TARGETS_FILE)
+    if not len(samples):
+        return
+
+    plt.figure(figsize=(12, 8))
+    for index, target in enumerate(meta["targets"]):
+        rows = samples[samples["target"] == index]
+        if not len(rows):
+            continue
+        last = rows[-1]
+        print(f"{target['label']}: {last['cpu_seconds']:.1f} CPU seconds, peak memory {rows['rss'].max() / 2 ** 20:.0f} MiB, "
+              f"read {last['read_bytes'] / 2 ** 20:.1f} MiB, written {last['write_bytes'] / 2 ** 20:.1f} MiB, energy {last['energy']:.1f} J")
+        series = downsample(rows)
+        plt.plot([datetime.fromtimestamp(ts) for ts in series["time"].tolist()], series["cpu"], label=f"{target['label']} CPU (% of one core)")
+
+    plt.title("Resource Usage per Target", fontsize=16)
+    plt.xlabel("Time", fontsize=12)
+    plt.ylabel("CPU (% of one core)", fontsize=12)
+    plt.legend(loc="upper left", fontsize=10)
+    plt.grid(True)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    graph_filename = "sustainability_targets.png"
+    plt.savefig(graph_filename)
+    print(f"Graph saved as {graph_filename}")
 
 def generate_graph():
     # Ensure there is data to plot
-    if not timestamps:
+    samples = read_metrics(METRICS_FILE) if os.path.exists(METRICS_FILE) else []
+    if not len(samples):
         print("No data available for graph generation.")
         return
 
-    # Ensure all lists have the same length
-    # min_length = min(len(timestamps), len(battery_percentages), len(cpu_usages), len(temperatures),
-    #                  len(active_cores), len(active_threads), len(avg_power_per_core), len(avg_power_per_thread))
-
-    min_length = min(len(timestamps), len(battery_percentages), len(cpu_usages), len(temperatures),
-                    len(active_cores), len(avg_power_per_core))
-
-    # Trim all lists to the same length
-    trimmed_timestamps = timestamps[:min_length]
-    trimmed_battery_percentages = battery_percentages[:min_length]
-    trimmed_cpu_usages = cpu_usages[:min_length]
-    trimmed_temperatures = temperatures[:min_length]
-    trimmed_active_cores = active_cores[:min_length]
-    # trimmed_active_threads = active_threads[:min_length]
-    trimmed_avg_power_per_core = avg_power_per_core[:min_length]
-    # trimmed_avg_power_per_thread = avg_power_per_thread[:min_length]
+    # Average high-rate samples into at most MAX_PLOT_POINTS points
+    series = downsample(samples)
 
     # Convert timestamps for plotting
-    time_labels = [datetime.strptime(ts, "%Y-%m-%d %H:%M:%S") for ts in trimmed_timestamps]
+    time_labels = [datetime.fromtimestamp(ts) for ts in series["time"].tolist()]
 
     # Create a new figure
     plt.figure(figsize=(12, 8))
 
     # Plot metrics
-    plt.plot(time_labels, trimmed_battery_percentages, label="Battery Percentage (%)", marker='o', color='blue')
-    plt.plot(time_labels, trimmed_cpu_usages, label="CPU Usage (%)", marker='o', color='green')
-    plt.plot(time_labels, trimmed_temperatures, label="Temperature (°C)", marker='o', color='red')
-    plt.plot(time_labels, trimmed_active_cores, label="Active Cores", linestyle='--', color='purple')
-    # plt.plot(time_labels, trimmed_active_threads, label="Active Threads", linestyle='--', color='cyan')
-    plt.plot(time_labels, trimmed_avg_power_per_core, label="Avg Power/Core (W)", linestyle='-', color='orange')
-    # plt.plot(time_labels, trimmed_avg_power_per_thread, label="Avg Power/Thread (W)", linestyle='-', color='magenta')
+    plt.plot(time_labels, series["battery"], label="Battery Percentage (%)", marker='o', color='blue')
+    plt.plot(time_labels, series["cpu"], label="CPU Usage (%)", marker='o', color='green')
+    plt.plot(time_labels, series["temperature"], label="Temperature (°C)", marker='o', color='red')
+    plt.plot(time_labels, series["active_cores"], label="Active Cores", linestyle='--', color='purple')
+    plt.plot(time_labels, series["avg_power_per_core"], label="Avg Power/Core (W)", linestyle='-', color='orange')
+    plt.plot(time_labels, series["power"], label="Package Power (W)", linestyle='-', color='brown')
 
     # Labels, legend, and title
     plt.title("Sustainability Metrics Over Time", fontsize=16)
@@ -168,40 +303,87 @@ def generate_graph():
 
     # Save graph locally
     graph_filename = "sustainability_report.png"
-    if graph_filename:
+    if os.path.exists(graph_filename):
         os.remove(graph_filename)
         print('\nRemoved exisitng graph.')
     plt.savefig(graph_filename)
     print(f"\nGraph saved as {graph_filename}")
+    generate_target_graph()
 
 
-def start_monitoring():
+def start_monitoring(rate=DEFAULT_RATE, sysfs_root="/sys", proc_root="/proc", targets=None):
     if os.path.exists(LOCK_FILE):
         print("Monitoring is already running.")
         return
 
     with open(LOCK_FILE, "w") as lock_file:
-        lock_file.write("running")
+        lock_file.write(str(os.getpid()))
 
-    monitor_sustainability_metrics()
+    try:
+        monitor_sustainability_metrics(rate, sysfs_root, proc_root, targets)
+    finally:
+        if os.path.exists(LOCK_FILE):
+            os.remove(LOCK_FILE)
+
+def wait_for_monitor(pid):
+    """Wait until the monitoring process has written its last samples and exited."""
+    try:
+        psutil.Process(pid).wait(timeout=STOP_TIMEOUT)
+    except psutil.NoSuchProcess:
+        pass
+    except psutil.TimeoutExpired:
+        print(f"Monitoring process {pid} did not exit within {STOP_TIMEOUT}s; using the samples written so far.")
+
+def signal_monitor(pid):
+    """Ask the monitoring process to stop; False if it is no longer running."""
+    try:
+        process = psutil.Process(pid)
+        # The pid may have been reused after the monitor died
+        if not any("sustainability" in part for part in process.cmdline()):
+            return False
+        process.send_signal(signal.SIGTERM)
+        return True
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
 
 def stop_monitoring():
     if os.path.exists(LOCK_FILE):
+        with open(LOCK_FILE, "r") as lock_file:
+            content = lock_file.read().strip()
+        if content.isdigit() and signal_monitor(int(content)):
+            wait_for_monitor(int(content))
+        if os.path.exists(LOCK_FILE):
+            os.remove(LOCK_FILE)
+        if os.path.exists(METRICS_FILE):
+            overhead = read_header(METRICS_FILE)[1].get("overhead")
+            if overhead:
+                print(f"Monitor overhead: {overhead['cpu_pct_of_one_core']}% of one core, {overhead['achieved_rate']} samples/s, "
+                      f"{overhead['missed_ticks']} missed ticks, max lag {overhead['max_lag_ms']} ms")
         generate_graph()
-        os.remove(LOCK_FILE)
         print("Monitoring stopped.")     
     else:
         print("Monitoring is not running.")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python sustainability_metrics.py [start|stop]")
-        sys.exit(1)
-
-    command = sys.argv[1].lower()
-    if command == "start":
-        start_monitoring()
-    elif command == "stop":
-        stop_monitoring()
+    parser = argparse.ArgumentParser(description="Record host sustainability metrics in the background.")
+    parser.add_argument("command", choices=["start", "stop"], type=str.lower, help="start sampling, or stop the running sampler and draw the graph")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help=f"Samples per second (default: {DEFAULT_RATE:g}, e.g. 10-100)")
+    parser.add_argument("--sysfs-root", default="/sys", help="sysfs mount to read RAPL and thermal zones from (default: /sys)")
+    parser.add_argument("--proc-root", default="/proc", help="procfs mount to read CPU times from (default: /proc)")
+    parser.add_argument("--process", action="append", default=[], help="Track processes whose name or command line contains this text, and their children: [label=]text (repeatable)")
+    parser.add_argument("--pid", action="append", default=[], help="Track the process tree of this pid: [label=]pid (repeatable)")
+    parser.add_argument("--cgroup", action="append", default=[], help="Track cgroup v2 groups matching this glob under <sysfs-root>/fs/cgroup, e.g. 'system.slice/docker-*.scope': [label=]glob (repeatable)")
+    args = parser.parse_args()
+
+    if args.rate <= 0:
+        parser.error("--rate must be positive")
+    cgroup_root = os.path.join(args.sysfs_root, "fs", "cgroup")
+    targets = []
+    for kind, specs in (("process", args.process), ("pid", args.pid), ("cgroup", args.cgroup)):
+        for spec in specs:
+            label, value = parse_target(spec)
+            targets.append(Target(label, kind, value, args.proc_root, cgroup_root))
+    if args.command == "start":
+        start_monitoring(args.rate, args.sysfs_root, args.proc_root, targets)
     else:
-        print("Invalid command. Use 'start' or 'stop'.")
+        stop_monitoring()
@@ -0,0 +1,155 @@
+import argparse
+import csv
+import io
+import logging
+import random
+import re
+import sys
+import time
+import yaml
+
+########### Global Declarations #########
+
+logging.basicConfig(level=logging.INFO)
+
+CHUNK_ROWS = 1 << 16
+WRITE_BUFFER = 1 << 22
+
+# {seq}, {seq:100}, {randint:1:9}, {uuid}, {choice:a|b|c}, {hex:8}
+PLACEHOLDER = re.compile(r'\{(seq|randint|uuid|choice|hex)(?::([^{}]*))?\}')
+
+# Extra last column that takes the --fixed-width padding, so no real value gets trailing spaces;
+# the CSV Data Set only binds the configured columns and ignores it
+PADDING_COLUMN = 'padding'
+
+# Version (4) and variant (10xx) bits of a random UUID
+UUID_CLEAR_MASK = ~((0xf << 76) | (0x3 << 62))
+UUID_V4_BITS = (0x4 << 76) | (0x2 << 62)
+
+
+########### Code  #########
+
+def random_uuid(bits):
+    """
+    Format 128 random bits as a version 4 UUID string without building uuid.UUID objects.
+    """
+    text = f'{(bits & UUID_CLEAR_MASK) | UUID_V4_BITS:032x}'
+    return f'{text[:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-{text[20:]}'
+
+def compile_column(template):
+    """
+    Split a value template into a str.format pattern and one generator per placeholder.
+    Each generator takes (start, count, rng) and returns the column values for that chunk.
+    """
+    generators = []
+    parts = []
+    last = 0
+    for match in PLACEHOLDER.finditer(template):
+        parts.append(template[last:match.start()].replace('{', '{{').replace('}', '}}'))
+        parts.append('{}')
+        last = match.end()
+        kind, argument = match.group(1), match.group(2) or ''
+        if kind == 'seq':
+            offset = int(argument or 1)
+            generators.append(lambda start, count, rng, offset=offset: range(start + offset, start + offset + count))
+        elif kind == 'randint':
+            low, high = (int(value) for value in argument.split(':'))
+            generators.append(lambda start, count, rng, low=low, high=high: [rng.randint(low, high) for _ in range(count)])
+        elif kind == 'uuid':
+            generators.append(lambda start, count, rng: [random_uuid(rng.getrandbits(128)) for _ in range(count)])
+        elif kind == 'choice':
+            choices = argument.split('|')
+            generators.append(lambda start, count, rng, choices=choices: rng.choices(choices, k=count))
+        else:
+            width = int(argument or 8)
+            generators.append(lambda start, count, rng, width=width: [f'{rng.getrandbits(width * 4):0{width}x}' for _ in range(count)])
+    parts.append(template[last:].replace('{', '{{').replace('}', '}}'))
+    return ''.join(parts), generators
+
+def generate_chunk(columns, start, count, rng):
+    """
+    Build the rows [start, start + count) column by column, so each placeholder is
+    produced in one batch instead of once per cell.
+    """
+    values = []
+    for pattern, generators in columns:
+        if not generators:
+            values.append([pattern.format()] * count)
+        else:
+            values.append(list(map(pattern.format, *(generate(start, count, rng) for generate in generators))))
+    return list(zip(*values))
+
+def format_rows(rows, delimiter):
+    """
+    CSV lines of rows; values with the delimiter, quotes or line breaks are quoted.
+    """
+    out = io.StringIO()
+    csv.writer(out, delimiter=delimiter, lineterminator='\n').writerows(rows)
+    return out.getvalue()
+
+def generate_csv(outfile, columns, rows, seed=None, fixed_width=0, delimiter=','):
+    """
+    Write a header plus `rows` rows to outfile. With fixed_width every line is padded to the
+    same length in an extra PADDING_COLUMN, so row N starts at a computable offset and the
+    file can be memory-mapped and sliced (e.g. split between load generators) without scanning it.
+    """
+    rng = random.Random(seed)
+    compiled = [compile_column(template) for template in columns.values()]
+    header = format_rows([list(columns) + ([PADDING_COLUMN] if fixed_width else [])], delimiter)[:-1]
+    if fixed_width and len(header) > fixed_width:
+        raise ValueError(f"Header is longer than the fixed width of {fixed_width} characters")
+
+    with open(outfile, 'w', buffering=WRITE_BUFFER, newline='') as wf:
+        wf.write((header.ljust(fixed_width) if fixed_width else header) + '\n')
+        for start in range(0, rows, CHUNK_ROWS):
+            count = min(CHUNK_ROWS, rows - start)
+            text = format_rows(generate_chunk(compiled, start, count, rng), delimiter)
+            if fixed_width:
+                lines = text.split('\n')[:-1]
+                if len(lines) != count:
+                    raise ValueError("Generated values contain line breaks, which cannot be written with a fixed width")
+                if max(map(len, lines)) + len(delimiter) > fixed_width:
+                    raise ValueError(f"A generated row is longer than the fixed width of {fixed_width} characters")
+                text = ''.join(f"{line}{delimiter}".ljust(fixed_width) + '\n' for line in lines)
+            wf.write(text)
+
+def load_columns(config_path):
+    """
+    Read tests.postman.csv_data from configfile.yml.
+    """
+    with open(config_path, 'r') as cf:
+        config = yaml.safe_load(cf) or {}
+    return ((config.get('tests') or {}).get('postman') or {}).get('csv_data') or {}
+
+def main(output=None, rows=None, column=None, config=None, seed=None, fixed_width=0):
+    csv_data = load_columns(config) if config else {}
+    columns = dict(csv_data.get('columns') or {})
+    for definition in column or []:
+        name, _, template = definition.partition('=')
+        columns[name.strip()] = template
+
+    if not columns:
+        logging.error("No columns given. Use --column name=template or tests.postman.csv_data.columns in the config file.")
+        sys.exit(1)
+
+    output = output or csv_data.get('file', 'test_data.csv')
+    rows = rows if rows is not None else int(csv_data.get('rows', 1000))
+    started = time.perf_counter()
+    try:
+        generate_csv(output, columns, rows, seed, fixed_width, csv_data.get('delimiter', ','))
+    except ValueError as e:
+        logging.error(f"Error generating test data: {e}")
+        sys.exit(1)
+    logging.info(f"Wrote {rows} rows to {output} in {time.perf_counter() - started:.2f}s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate CSV test data for the JMeter CSV Data Set Config from value templates.")
+    parser.add_argument("--output", help="CSV file to write (default: csv_data.file from the config or test_data.csv)")
+    parser.add_argument("--rows", type=int, help="Number of data rows")
+    parser.add_argument("--column", action="append", help="Column as name=template, e.g. username=user_{seq} (repeatable)")
+    parser.add_argument("--config", help="configfile.yml to read tests.postman.csv_data from")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible data")
+    parser.add_argument("--fixed-width", type=int, default=0, help=f"Pad every line to this many characters, in an extra '{PADDING_COLUMN}' column")
+    args = parser.parse_args()
+
+    main(args.output, args.rows, args.column, args.config, args.seed, args.fixed_width)